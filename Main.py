@@ -1,8 +1,11 @@
+import argparse
+import os
 import sys
 import logging
 import traceback
 from PyQt5.QtWidgets import QApplication, QMessageBox
 from ui import PipsChatAnalyserUI
+from profiling import profiler
 
 def setup_logging():
     logging.basicConfig(
@@ -23,13 +26,36 @@ def exception_hook(exctype, value, tb):
     QMessageBox.critical(None, "Critical Error", error_msg)
     sys.__excepthook__(exctype, value, tb)
 
+def env_profile_cycles():
+    value = os.environ.get('CHAT_PROFILE', '')
+    try:
+        return int(value or 0)
+    except ValueError:
+        logging.warning(f"CHAT_PROFILE={value} is not a number of cycles, profiling is off")
+        return 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PIPS CHAT ANALYSER")
+    parser.add_argument('--profile', type=int, nargs='?', const=20, default=None,
+                        metavar='CYCLES', help="Profile this many capture cycles and replies (also CHAT_PROFILE=CYCLES)")
+    parser.add_argument('--profile-dir', default=os.environ.get('CHAT_PROFILE_DIR', './profiles'),
+                        help="Folder for the profiles (also CHAT_PROFILE_DIR)")
+    # Anything else is left for Qt, e.g. -platform
+    return parser.parse_known_args()
+
 def main():
+    args, qt_args = parse_args()
     setup_logging()
     sys.excepthook = exception_hook
     logging.info("Starting PIPS CHAT ANALYSER")
+    # Read after setup_logging so a bad CHAT_PROFILE is logged
+    if args.profile is None:
+        args.profile = env_profile_cycles()
+    if args.profile:
+        profiler.configure(args.profile, args.profile_dir)
     
     try:
-        app = QApplication(sys.argv)
+        app = QApplication(sys.argv[:1] + qt_args)
     except Exception as e:
         logging.critical(f"Error creating QApplication: {str(e)}", exc_info=True)
         print(f"Error creating QApplication: {str(e)}")
@@ -1,11 +1,14 @@
 import logging
+from collections import deque
 from PyQt5.QtCore import QObject, pyqtSignal, QThread
 from PyQt5.QtWidgets import QProgressDialog
 from PyQt5.QtCore import Qt
 from utils import append_to_csv
+from conversation_log import open_conversation_log
+from profiling import profiler
 
 class OllamaWorker(QThread):
-    finished = pyqtSignal(str, str)
+    reply_ready = pyqtSignal(str, str)
 
     def __init__(self, ollama_api, system_prompt, username, message, chat_input_position, conversation_history):
         super().__init__()
@@ -17,6 +20,10 @@ class OllamaWorker(QThread):
         self.conversation_history = conversation_history
 
     def run(self):
+        with profiler.profile('reply'):
+            self.generate_reply()
+
+    def generate_reply(self):
         try:
             # Prepare the prompt with the conversation history
             full_prompt = self.system_prompt + "\n\nConversation history:\n"
@@ -25,13 +32,13 @@ class OllamaWorker(QThread):
             full_prompt += f"\nPlease respond to the following message from {self.username}:"
 
             response = self.ollama_api.send_request(full_prompt, f"Message from {self.username}:", self.message)
-            self.finished.emit(response, "")
+            self.reply_ready.emit(response, "")
         except Exception as e:
-            self.finished.emit("", str(e))
+            self.reply_ready.emit("", str(e))
 
 class AIHandler(QObject):
     response_ready = pyqtSignal(str, str)
-    ai_response_complete = pyqtSignal()
+    ai_response_complete = pyqtSignal(object)
 
     def __init__(self, ollama_api, background_prompt, chat_position_handler):
         super().__init__()
@@ -39,11 +46,30 @@ class AIHandler(QObject):
         self.background_prompt = background_prompt
         self.chat_position_handler = chat_position_handler
         self.log_file = None
+        self.worker = None
+        self.workers = []  # Workers whose thread may still be running, the next reply can start before run() returns
+        self.current_request = None
+        self.pending_requests = deque()  # Replies for other chats wait here, only one is typed at a time
 
     def set_log_file(self, log_file):
         self.log_file = log_file
 
-    def process_new_message(self, username, message, chat_input_position, conversation_history):
+    def set_ollama_api(self, ollama_api):
+        # Requests already running keep the API they were started with
+        self.ollama_api = ollama_api
+
+    def process_new_message(self, username, message, chat_input_position, conversation_history, log_file=None, tag=None):
+        # tag is handed back through ai_response_complete so the caller knows which chat was answered
+        self.pending_requests.append((username, message, chat_input_position, conversation_history, log_file, tag))
+        if self.current_request is None:
+            self.start_next_request()
+        else:
+            logging.info(f"Ollama busy, reply to {username} queued ({len(self.pending_requests)} waiting)")
+
+    def start_next_request(self):
+        self.current_request = self.pending_requests.popleft()
+        username, message, chat_input_position, conversation_history, log_file, tag = self.current_request
+
         # Create and show progress dialog
         progress = QProgressDialog("Processing message...", "Cancel", 0, 0)
         progress.setWindowTitle("AI Response")
@@ -53,25 +79,39 @@ class AIHandler(QObject):
 
         # Create worker thread
         self.worker = OllamaWorker(self.ollama_api, self.background_prompt, username, message, chat_input_position, conversation_history)
-        self.worker.finished.connect(self.on_worker_finished)
-        self.worker.finished.connect(progress.close)
+        self.worker.reply_ready.connect(self.on_worker_finished)
+        self.worker.reply_ready.connect(progress.close)
+        self.worker.finished.connect(self.release_worker)
+        self.workers.append(self.worker)
         self.worker.start()
 
+    def release_worker(self):
+        worker = self.sender()
+        if worker in self.workers:
+            self.workers.remove(worker)
+            worker.deleteLater()
+
     def on_worker_finished(self, response, error):
+        username, message, chat_input_position, conversation_history, log_file, tag = self.current_request
+        log_file = log_file or self.log_file
         if error:
             logging.error(f"Error in Ollama response: {error}")
         else:
             logging.info(f"Ollama's response: {response}")
             # Type the response into the chat
-            self.chat_position_handler.type_message(response)
+            self.chat_position_handler.type_message(response, chat_input_position)
             # Update the CSV with Ollama's response
-            if self.log_file:
-                append_to_csv(self.log_file, "ollama_auto_reply", "Ollama", response)
+            if log_file:
+                append_to_csv(log_file, "ollama_auto_reply", "Ollama", response)
+                open_conversation_log(log_file).end_cycle()
                 logging.info(f"Reply sent to $Other user from Ollama.")
             else:
                 logging.warning("Log file not set, unable to append Ollama response to CSV")
+        self.current_request = None
         self.response_ready.emit(response, error)
-        self.ai_response_complete.emit()
+        self.ai_response_complete.emit(tag)
+        if self.pending_requests:
+            self.start_next_request()
 
     def set_background_prompt(self, prompt):
         self.background_prompt = prompt
\ No newline at end of file
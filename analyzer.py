@@ -1,34 +1,46 @@
 import logging
-import pytesseract
-from PIL import Image, ImageGrab, ImageOps, ImageEnhance
+from PIL import Image
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QSizeGrip, QPushButton
 from PyQt5.QtCore import Qt, pyqtSignal, QSize, QRect
 from PyQt5.QtGui import QPainter, QColor, QPen
 import traceback
+from frame_diff import FrameDiffer
+from scroll_tracker import ScrollTracker
+from ocr_engine import create_ocr_engine
+from frame_buffer import FrameRingBuffer
+from preprocessing import PreprocessingPipeline
+from screen_grab import create_screen_grabber
+from metrics import metrics
 
 class TransparentWindow(QWidget):
     text_captured = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, ocr_engine=None, frame_buffer_size=10, debug_mode=False, preprocessing=None, screen_grabber=None, name="", geometry=None):
         super().__init__()
+        self.name = name  # Shown in the corner when several chats are watched
         self.min_size = QSize(50, 50)
         self.border_width = 2
         self.corner_size = 10
         self.capture_inset = 5
         self.capture_reduction = 1
         self.buffer_zone = 20  # New: Buffer zone size in pixels
-        self.recent_lines = []  # New: List to store recent lines
-        self.max_recent_lines = 20  # New: Maximum number of recent lines to store
+        self.frame_differ = FrameDiffer()
+        self.scroll_tracker = ScrollTracker()
+        self.transcript_lines = []  # Stitched text of the chat as currently known
+        self.max_transcript_lines = 200
+        self.frame_buffer = FrameRingBuffer(frame_buffer_size)
+        self.debug_mode = debug_mode
+        self.preprocessor = PreprocessingPipeline(preprocessing)
+        self.preprocessing_changed = False  # Set from the GUI thread, the capture worker resets its scroll state
+        self.probed_frame = None  # Frame grabbed by the last probe, reused by the next capture
+        self.probed_digest = None
+        self.capture_bbox = None  # Screen rectangle to grab, kept current by the GUI thread for the capture worker
         self.initUI()
+        if geometry:
+            self.setGeometry(*geometry)
         self.oldPos = None
-        
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        logging.info(f"Tesseract path set to: {pytesseract.pytesseract.tesseract_cmd}")
-        
-        try:
-            logging.info(f"Tesseract version: {pytesseract.get_tesseract_version()}")
-        except Exception as e:
-            logging.error(f"Error getting Tesseract version: {str(e)}")
+        self.ocr_engine = ocr_engine or create_ocr_engine()
+        self.screen_grabber = screen_grabber or create_screen_grabber()
 
     def initUI(self):
         self.setWindowTitle('Chat Analyzer')
@@ -63,6 +75,10 @@ class TransparentWindow(QWidget):
         painter.setPen(QPen(QColor(200, 200, 200), 1, Qt.DashLine))
         painter.drawRect(capture_area)
 
+        if self.name:
+            painter.setPen(QColor(255, 255, 255))
+            painter.drawText(self.border_width + 4, self.border_width + 12, self.name)
+
         self.close_button.move(self.width() - self.close_button.width(), 0)
 
     def mousePressEvent(self, event):
@@ -94,59 +110,120 @@ class TransparentWindow(QWidget):
             -self.capture_reduction
         )
 
-    def capture_screen(self):
+    def get_capture_bbox(self):
+        capture_area = self.get_actual_capture_area()
+        top_left = self.mapToGlobal(capture_area.topLeft())
+        x, y = top_left.x(), top_left.y()
+        w, h = capture_area.width(), capture_area.height()
+        return (x, y, x + w, y + h)
+
+    def update_capture_bbox(self):
+        # Widget geometry may only be read on the GUI thread, the worker only sees this snapshot
+        self.capture_bbox = self.get_capture_bbox()
+
+    def probe(self):
+        # Cheap change check for the capture scheduler: one grab and a hash, no preprocessing or OCR
+        self.probed_frame = self.screen_grabber.grab(self.capture_bbox)
+        self.probed_digest = self.frame_differ.digest(self.probed_frame)
+        return self.probed_digest
+
+    def capture_screen(self, force=False):
         try:
             logging.debug("Entering capture_screen method")
             
-            capture_area = self.get_actual_capture_area()
-            top_left = self.mapToGlobal(capture_area.topLeft())
-            x, y = top_left.x(), top_left.y()
-            w, h = capture_area.width(), capture_area.height()
-            logging.info(f"Capture coordinates: x={x}, y={y}, w={w}, h={h}")
+            screenshot, digest = self.probed_frame, self.probed_digest
+            self.probed_frame = self.probed_digest = None
+            if screenshot is None or force:
+                digest = None
+                x, y, right, bottom = self.capture_bbox
+                logging.info(f"Capture coordinates: x={x}, y={y}, w={right - x}, h={bottom - y}")
+                screenshot = self.screen_grabber.grab((x, y, right, bottom))
+            if self.debug_mode:
+                screenshot.save("debug_screenshot.png")
+            
+            if force:
+                self.frame_differ.reset()
+            if force or self.preprocessing_changed:
+                # Text read with another pipeline may differ, read the whole frame again
+                self.preprocessing_changed = False
+                self.scroll_tracker.reset()
+            if not self.frame_differ.check(screenshot, digest):
+                self.frame_differ.log_stats()
+                return ""
+            
+            self.frame_buffer.add(screenshot)
             
-            screenshot = ImageGrab.grab(bbox=(x, y, x + w, y + h))
-            screenshot.save("debug_screenshot.png")
+            # Align on the raw frame: stages such as contrast depend on the whole frame and would
+            # change every preprocessed row when a single new line arrives
+            first_new_row = self.scroll_tracker.find_new_rows(screenshot)
+            if first_new_row >= screenshot.height:
+                return ""
+            if first_new_row:
+                screenshot = screenshot.crop((0, first_new_row, screenshot.width, screenshot.height))
             
-            screenshot = screenshot.convert('L')
-            screenshot = ImageOps.invert(screenshot)
-            enhancer = ImageEnhance.Contrast(screenshot)
-            screenshot = enhancer.enhance(2)
+            with metrics.time('preprocess'):
+                screenshot = self.preprocessor(screenshot)
+            self.frame_buffer.set_processed(screenshot)
             
-            custom_config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(screenshot, config=custom_config)
+            with metrics.time('ocr'):
+                text = self.ocr_engine.image_to_string(screenshot)
             
-            unique_text = self.process_new_text(text)
+            new_lines = self.stitch_transcript(text, full_frame=first_new_row == 0, reread_lines=self.scroll_tracker.reread_lines)
             
-            logging.debug(f"OCR completed. Captured text length: {len(unique_text)}")
-            if not unique_text:
+            logging.debug(f"OCR completed. {len(new_lines)} new lines read")
+            if not new_lines:
                 logging.warning("No new text captured")
-            else:
-                logging.debug(f"Captured text: {unique_text}")
-                self.text_captured.emit(unique_text)
+                return ""
+            logging.debug(f"Captured text: {new_lines}")
+            self.text_captured.emit('\n'.join(new_lines))
             
-            return unique_text
+            # The caller aligns the whole transcript against the previous one to work out what is new,
+            # so repeated messages are judged by position instead of being dropped as seen before
+            return '\n'.join(self.transcript_lines)
         except Exception as e:
+            self.scroll_tracker.reset()
             logging.error(f"Unexpected error in capture_screen: {str(e)}")
             logging.error(traceback.format_exc())
+            self.dump_debug_frames("capture error")
             return ""
 
-    def process_new_text(self, text):
-        new_lines = text.split('\n')
-        unique_new_lines = []
-        
-        for line in new_lines:
-            line = line.strip()
-            if line and line not in self.recent_lines:
-                unique_new_lines.append(line)
-        
-        # Update recent lines
-        self.recent_lines = (self.recent_lines + unique_new_lines)[-self.max_recent_lines:]
-        
-        return '\n'.join(unique_new_lines)
+    def set_debug_options(self, frame_buffer_size, debug_mode):
+        self.frame_buffer.resize(frame_buffer_size)
+        self.debug_mode = debug_mode
+
+    def set_preprocessing(self, stages):
+        self.preprocessor = PreprocessingPipeline(stages)
+        self.preprocessing_changed = True
+        logging.info(f"Preprocessing pipeline: {self.preprocessor.describe()}")
+
+    def dump_debug_frames(self, reason="manual"):
+        return self.frame_buffer.dump(reason)
+
+    def stitch_transcript(self, text, full_frame, reread_lines=0):
+        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        if full_frame:
+            self.transcript_lines = lines[-self.max_transcript_lines:]
+            return lines
+
+        # The band starts below everything read before, apart from the lines the scroll tracker
+        # backed up over to reach a gap. Those are dropped by count, not by value, so a repeated
+        # message right after the same message is still new
+        new_lines = lines[reread_lines:]
+        self.transcript_lines = (self.transcript_lines + new_lines)[-self.max_transcript_lines:]
+        return new_lines
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.close_button.move(self.width() - self.close_button.width(), 0)
+        self.update_capture_bbox()
+
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.update_capture_bbox()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_capture_bbox()
 
     def closeEvent(self, event):
         logging.info("Closing TransparentWindow")
@@ -0,0 +1,114 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from bench_utils import mean_time
+from conversation_log import ConversationLog, HEADER
+from utils import get_conversation_context
+
+def legacy_append(log_file, conversation_type, username, message):
+    # append_to_csv before the conversation log: parse the whole file for the last ID, reopen to append
+    with open(log_file, mode='r', newline='', encoding='utf-8') as readfile:
+        lines = list(csv.reader(readfile))
+        last_id = int(lines[-1][0]) if len(lines) > 1 else 0
+    with open(log_file, mode='a', newline='', encoding='utf-8') as file:
+        csv.writer(file).writerow([f"{last_id + 1:04d}", conversation_type, username, message])
+
+def legacy_last_messages(log_file, n):
+    # get_last_messages before tail reads: parse the whole file and slice
+    with open(log_file, mode='r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader)
+        messages = list(reader)
+        return [(row[2], row[3]) for row in messages[-n:]]
+
+def per_call_ms(func, calls=20):
+    return mean_time(func, calls) * 1000
+
+def write_log(path, rows):
+    with open(path, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            # Some messages span lines, as pasted text does
+            message = f"message number {i} with a few words" + ("\nand a second line" if i % 50 == 0 else "")
+            writer.writerow([f"{i + 1:04d}", "captured_conversation", "Bob" if i % 2 else "Harry", message])
+
+def per_append_us(append, appends):
+    start = time.perf_counter()
+    for i in range(appends):
+        append("captured_conversation", "Bob", f"new message {i}")
+    return (time.perf_counter() - start) / appends * 1e6
+
+def bench_size(folder, rows, appends, lines_per_cycle, history):
+    path = os.path.join(folder, f"chatlog_{rows}.csv")
+    write_log(path, rows)
+    legacy_us = per_append_us(lambda *row: legacy_append(path, *row), appends)
+
+    write_log(path, rows)
+    start = time.perf_counter()
+    log = ConversationLog(path)
+    open_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for i in range(appends):
+        log.append("captured_conversation", "Bob", f"new message {i}")
+        if (i + 1) % lines_per_cycle == 0:
+            log.end_cycle()
+    log.close()
+    log_us = (time.perf_counter() - start) / appends * 1e6
+
+    with open(path, newline='', encoding='utf-8') as file:
+        last = list(csv.reader(file))[-1]
+    assert int(last[0]) == rows + appends, f"IDs out of step: {last[0]} after {rows + appends} rows"
+
+    # One initial capture of a full chat window: a row at a time before, one batch now
+    window = [("captured_conversation", "Bob", f"visible line {i}") for i in range(60)]
+    legacy_cycle_ms = per_call_ms(lambda: [legacy_append(path, *row) for row in window], calls=3)
+    log = ConversationLog(path)
+    def batch_cycle():
+        log.append_batch(window)
+        log.end_cycle()
+    batch_cycle_ms = per_call_ms(batch_cycle, calls=3)
+    log.close()
+
+    # Reading the history for a reply
+    log = ConversationLog(path)
+    assert log.last_messages(history) == legacy_last_messages(path, history)
+    legacy_history_ms = per_call_ms(lambda: legacy_last_messages(path, history))
+    tail_history_ms = per_call_ms(lambda: log.last_messages(history))
+    context_ms = per_call_ms(lambda: get_conversation_context(path))
+    log.close()
+    return {'rows': rows, 'legacy_append_us': legacy_us, 'log_append_us': log_us, 'open_ms': open_ms,
+            'legacy_history_ms': legacy_history_ms, 'tail_history_ms': tail_history_ms, 'context_ms': context_ms,
+            'legacy_cycle_ms': legacy_cycle_ms, 'batch_cycle_ms': batch_cycle_ms}
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row append cost of the conversation log as the CSV grows")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000], help="Rows already in the log")
+    parser.add_argument('--appends', type=int, default=200, help="Rows appended per size")
+    parser.add_argument('--lines-per-cycle', type=int, default=3, help="Rows per capture cycle (flushed together)")
+    parser.add_argument('--history', type=int, default=100, help="Messages read back for a reply")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_conversation_log_")
+    try:
+        results = [bench_size(folder, rows, args.appends, args.lines_per_cycle, args.history) for rows in args.sizes]
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    for result in results:
+        print(f"rows={result['rows']:<7} legacy append={result['legacy_append_us']:10.1f} us  "
+              f"conversation log append={result['log_append_us']:7.1f} us  open={result['open_ms']:6.2f} ms")
+        print(f"{'':<12} last {args.history} messages: full read={result['legacy_history_ms']:8.2f} ms  "
+              f"tail read={result['tail_history_ms']:6.2f} ms  token budgeted context={result['context_ms']:6.2f} ms")
+        print(f"{'':<12} 60 line capture: row at a time={result['legacy_cycle_ms']:8.2f} ms  one batch={result['batch_cycle_ms']:6.2f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import random
+from bench_utils import mean_time
+from dedupe_index import DedupeIndex
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ocr_misreads.json')
+
+def score_corpus(corpus, **options):
+    # duplicates: the same message read twice with OCR errors, must share an id
+    # distinct: different messages that look alike, must not
+    matched = sum(1 for original, misread in corpus['duplicates'] if same_id(original, misread, options))
+    false_matches = [pair for pair in corpus['distinct'] if same_id(*pair, options)]
+    return matched / len(corpus['duplicates']), false_matches
+
+def same_id(first, second, options):
+    index = DedupeIndex(**options)
+    return index.canonical_id(first) == index.canonical_id(second)
+
+def random_lines(count, seed=0):
+    rng = random.Random(seed)
+    words = "the a to at see you game night mate tomorrow bring chips footy season pub link time start drive".split()
+    return [f"User{rng.randrange(50)}: " + ' '.join(rng.choice(words) for _ in range(rng.randint(3, 9))) for _ in range(count)]
+
+def per_line_us(func, lines):
+    def run():
+        for line in lines:
+            func(line)
+    return mean_time(run, 1) / len(lines) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate recall and per-line cost of the OCR dedupe index")
+    parser.add_argument('--corpus', default=CORPUS, help="JSON file with duplicates and distinct line pairs")
+    parser.add_argument('--similarity', type=float, default=0.9, help="Character similarity a near duplicate needs")
+    parser.add_argument('--capacity', type=int, default=2000)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding='utf-8') as f:
+        corpus = json.load(f)
+    recall, false_matches = score_corpus(corpus, similarity=args.similarity)
+    print(f"misread recall={recall:.2%} ({len(corpus['duplicates'])} pairs)  "
+          f"false matches={len(false_matches)} of {len(corpus['distinct'])}")
+    for pair in false_matches:
+        print(f"  false match: {pair[0]!r} ~ {pair[1]!r}")
+
+    # Cost on a full index: new lines fingerprint and probe the band buckets, repeats are one dict hit
+    index = DedupeIndex(capacity=args.capacity, similarity=args.similarity)
+    lines = random_lines(args.capacity * 2)
+    new_us = per_line_us(index.canonical_id, lines)
+    repeat_us = per_line_us(index.canonical_id, lines[-args.capacity // 2:])
+    print(f"new line={new_us:.1f} us  repeated line={repeat_us:.1f} us  entries={len(index)} (capacity {args.capacity})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'recall': recall, 'false_matches': false_matches, 'new_line_us': new_us,
+                       'repeat_line_us': repeat_us, 'entries': len(index)}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import argparse
+import json
+import random
+import re
+import time
+from bench_utils import mean_time
+from ignore_matcher import IgnoreMatcher, DATE_PATTERNS
+
+SAMPLE_LINES = [
+    "Bob: are you going to the footy this season", "Harry: yeah mate wouldnt miss it",
+    "Friday, September 13th v", "Bob: sweet, saturday arvo?", "Today v", "Harry: sounds good see you at 5",
+    "September 16th, 2024", "Bob joined the chat", "Harry: lol", "Bob: yeah",
+]
+
+def legacy_is_ignored_line(line, ignored_patterns):
+    # The per-pattern loop the matcher replaced
+    for pattern in ignored_patterns:
+        if re.search(pattern, line):
+            return True
+    for pattern in DATE_PATTERNS:
+        if re.search(pattern, line):
+            return True
+    return False
+
+def make_patterns(count, seed=0):
+    # Mix of plain phrases and regexes, roughly what users paste into ignored_lines
+    rng = random.Random(seed)
+    words = ["joined", "left", "muted", "pinned", "system", "bot", "welcome", "reaction", "typing", "edited"]
+    patterns = []
+    for i in range(count):
+        if i % 3 == 0:
+            patterns.append(rf"^{rng.choice(words).title()}\d*: .*{i}$")
+        else:
+            patterns.append(f"{rng.choice(words)} the chat {i}")
+    return patterns
+
+def per_line_us(func, lines, rounds):
+    def run():
+        for line in lines:
+            func(line)
+    return mean_time(run, rounds) / len(lines) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-line cost of ignore pattern matching as the pattern list grows")
+    parser.add_argument('--sizes', default="0,10,50,100,250,500", help="Comma separated pattern counts")
+    parser.add_argument('--rounds', type=int, default=200, help="Passes over the sample lines per measurement")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(value) for value in args.sizes.split(',')]:
+        patterns = make_patterns(size)
+        build_start = time.perf_counter()
+        matcher = IgnoreMatcher(patterns)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        # Both sides must agree before their speed is worth comparing
+        for line in SAMPLE_LINES:
+            assert matcher.matches(line) == legacy_is_ignored_line(line, patterns), line
+
+        legacy = per_line_us(lambda line: legacy_is_ignored_line(line, patterns), SAMPLE_LINES, args.rounds)
+        combined = per_line_us(matcher.matches, SAMPLE_LINES, args.rounds)
+        results.append({'patterns': size, 'legacy_us': legacy, 'matcher_us': combined, 'build_ms': build_ms})
+        print(f"{size:>5} patterns  legacy={legacy:9.2f} us/line  matcher={combined:8.2f} us/line  "
+              f"speedup={legacy / combined:6.1f}x  build={build_ms:7.2f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
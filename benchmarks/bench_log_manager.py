@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from bench_utils import mean_time
+from bench_conversation_log import write_log
+import log_manager
+from log_manager import LogManager, open_log_text
+
+def legacy_allocate(log_folder):
+    # create_new_log_file before the manifest: probe names until one is free
+    i = 1
+    while os.path.exists(f"{log_folder}/chatlog{i:04d}.csv"):
+        i += 1
+    return f"{log_folder}/chatlog{i:04d}.csv"
+
+def bench_allocation(logs, allocations):
+    folder = tempfile.mkdtemp(prefix="bench_log_manager_")
+    try:
+        for i in range(1, logs + 1):
+            open(os.path.join(folder, f"chatlog{i:04d}.csv"), 'w').close()
+        legacy_ms = mean_time(lambda: open(legacy_allocate(folder), 'w').close(), allocations) * 1000
+
+        manager = LogManager(folder, compression='none')
+        start = time.perf_counter()
+        manager.load()  # One scan of the folder the first time, then the manifest
+        bootstrap_ms = (time.perf_counter() - start) * 1000
+        manifest_ms = mean_time(lambda: open(manager.allocate(), 'w').close(), allocations) * 1000
+        return {'logs': logs, 'legacy_allocate_ms': legacy_ms, 'manifest_allocate_ms': manifest_ms, 'manifest_bootstrap_ms': bootstrap_ms}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def bench_compression(rows, compression):
+    folder = tempfile.mkdtemp(prefix="bench_log_manager_")
+    try:
+        manager = LogManager(folder, compression=compression)
+        path = manager.allocate()
+        write_log(path, rows)
+        size = os.path.getsize(path)
+        manager.log_closed(path)
+        start = time.perf_counter()
+        manager.compactor.shutdown(wait=True)
+        compress_ms = (time.perf_counter() - start) * 1000
+        packed = manager.manifest['logs'][os.path.basename(path)]['file']
+        start = time.perf_counter()
+        with open_log_text(path) as f:
+            lines = sum(1 for _ in f)
+        read_ms = (time.perf_counter() - start) * 1000
+        return {'rows': rows, 'compression': compression, 'size_kb': size / 1024,
+                'compressed_kb': os.path.getsize(os.path.join(folder, packed)) / 1024,
+                'compress_ms': compress_ms, 'read_ms': read_ms, 'lines': lines}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Log file allocation cost and closed-log compaction")
+    parser.add_argument('--logs', type=int, nargs='+', default=[10, 1000, 5000], help="Logs already in the folder")
+    parser.add_argument('--allocations', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=20000, help="Rows in the log that is compressed")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    allocation = [bench_allocation(logs, args.allocations) for logs in args.logs]
+    for result in allocation:
+        print(f"logs={result['logs']:<6} probing allocate={result['legacy_allocate_ms']:8.3f} ms  "
+              f"manifest allocate={result['manifest_allocate_ms']:6.3f} ms  first manifest scan={result['manifest_bootstrap_ms']:7.2f} ms")
+
+    compression = [bench_compression(args.rows, name) for name in ('gzip', 'zstd') if name == 'gzip' or log_manager.zstandard is not None]
+    for result in compression:
+        print(f"{result['compression']:<5} {result['rows']} rows: {result['size_kb']:.0f} KiB -> {result['compressed_kb']:.0f} KiB "
+              f"in {result['compress_ms']:.1f} ms, streamed back in {result['read_ms']:.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'allocation': allocation, 'compression': compression}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,41 @@
+import argparse
+import logging
+from bench_utils import time_calls, summarize, format_summary, load_images, sample_chat_image
+from ocr_engine import OCR_ENGINES, create_ocr_engine
+
+def bench_ocr_engines(images, runs, tesseract_cmd=None, workers=1):
+    results = {}
+    for name in OCR_ENGINES:
+        try:
+            engine = create_ocr_engine(name, tesseract_cmd, workers)
+            if not engine.name.startswith(name):
+                raise RuntimeError("not available on this system")
+            engine.image_to_string(images[0][1])  # Warm up, the first call loads the model
+        except Exception as e:
+            logging.error(f"Skipping {name}: {str(e)}")
+            continue
+
+        timings = []
+        for _, image in images:
+            timings += time_calls(lambda: engine.image_to_string(image), runs)
+        results[engine.name] = summarize(timings)
+        engine.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-frame latency of the available OCR engines")
+    parser.add_argument('--images', help="Folder of chat screenshots (defaults to a synthetic sample)")
+    parser.add_argument('--runs', type=int, default=10, help="OCR calls per image")
+    parser.add_argument('--tesseract-cmd', default=None)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1],
+                        help="Pool sizes to compare, e.g. 1 2 4 (1 runs without a pool)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    images = load_images(args.images) if args.images else [("sample", sample_chat_image().convert('L'))]
+    for workers in args.workers:
+        for name, summary in bench_ocr_engines(images, args.runs, args.tesseract_cmd, workers).items():
+            print(format_summary(name, summary))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
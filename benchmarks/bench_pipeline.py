@@ -0,0 +1,227 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from bench_utils import summarize, format_summary
+from fake_ollama import FakeOllamaServer
+from capture_handler import CaptureHandler
+import conversation_log
+from conversation_log import close_conversation_log
+from seen_index import SeenMessageIndex, index_path
+from utils import append_batch_to_csv, get_last_messages, create_new_log_file
+
+MY_USERNAME = "Harry"
+OTHER_USERNAMES = ["Bob", "Sue"]
+IGNORED_PATTERNS = [r"^\d{1,2}:\d{2}$"]
+WORDS = ("are you going to the footy this season mate sweet saturday arvo sounds good see you at "
+         "five grab some pies on the way did you watch the game last night what a finish "
+         "reckon we win the flag this year no chance the forwards cant kick straight").split()
+# Misreads Tesseract makes on chat fonts, applied to some visible lines of some frames
+MISREADS = [("m", "rn"), ("l", "1"), ("o", "0"), ("s", "5"), ("w", "vv"), ("d", "cl")]
+STAGES = ['ocr', 'parse', 'align', 'log', 'history', 'reply']
+
+class RecordingTyper:
+    # Stands in for ChatPositionHandler, which drives the real mouse and keyboard
+    def __init__(self):
+        self.typed = []
+
+    def type_message(self, message, position=None):
+        self.typed.append(message)
+
+def synthetic_frames(messages, visible_lines, noise, seed, repeats=0.1):
+    # A chat that scrolls as messages arrive, one or two new messages per frame, with OCR misreads.
+    # A share of messages repeats the one before it word for word ("lol", "lol"), which must still
+    # be logged. Returns the frames and the number of messages in the chat
+    rng = random.Random(seed)
+    users = [MY_USERNAME] + OTHER_USERNAMES
+    transcript, frames = [], []
+    while len(transcript) < messages:
+        for _ in range(rng.randint(1, 2)):
+            if transcript and rng.random() < repeats:
+                transcript.append(transcript[-1])
+                continue
+            words = rng.sample(WORDS, rng.randint(3, 9))
+            transcript.append(f"{rng.choice(users)}: {' '.join(words)}")
+        lines = []
+        for line in transcript[-visible_lines:]:
+            if rng.random() < noise:
+                wrong, right = rng.choice(MISREADS)
+                line = line.replace(wrong, right, 1)
+            lines.append(line)
+        frames.append('\n'.join(lines))
+    return frames, len(transcript)
+
+def text_frames(source):
+    # A JSON list of OCR outputs, or a folder with one .txt file per frame
+    if os.path.isdir(source):
+        frames = []
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith('.txt'):
+                with open(os.path.join(source, name), encoding='utf-8') as f:
+                    frames.append(f.read())
+        return frames
+    with open(source, encoding='utf-8') as f:
+        return json.load(f)
+
+def image_capture(source, tesseract_cmd):
+    # Screenshots go through the analyzer window's own diff, scroll alignment, preprocessing and OCR
+    from PyQt5.QtWidgets import QApplication
+    from analyzer import TransparentWindow
+    from ocr_engine import create_ocr_engine
+    from screen_grab import ReplayGrabber
+    app = QApplication.instance() or QApplication(sys.argv)
+    grabber = ReplayGrabber(source)
+    window = TransparentWindow(create_ocr_engine(tesseract_cmd=tesseract_cmd), screen_grabber=grabber)
+    window.app = app  # A QApplication created here must outlive this function
+    window.capture_bbox = (0, 0, 1, 1)  # Ignored by the replay grabber
+    return window, grabber.frame_count
+
+def new_log_file(folder):
+    log_file = os.path.join(folder, "chatlog0001.csv")
+    with open(log_file, mode='w', newline='', encoding='utf-8') as file:
+        csv.writer(file).writerow(["ID", "Conversation", "Username", "Message"])
+    return log_file
+
+class PipelineBench:
+    def __init__(self, ollama_url=None, history=10, backend='csv'):
+        self.folder = tempfile.mkdtemp(prefix="bench_pipeline_")
+        if backend == 'sqlite':
+            conversation_log.set_backend('sqlite', os.path.join(self.folder, "conversations.db"))
+            self.log_file = create_new_log_file()
+        else:
+            self.log_file = new_log_file(self.folder)
+        self.seen_index = SeenMessageIndex(index_path(self.folder, "bench"))
+        self.handler = CaptureHandler(None, MY_USERNAME, OTHER_USERNAMES, IGNORED_PATTERNS, seen_index=self.seen_index)
+        self.history = history
+        self.timings = {stage: [] for stage in STAGES}
+        self.frame_timings = []
+        self.messages = 0
+        self.typer = RecordingTyper()
+        self.ai_handler = None
+        if ollama_url:
+            from PyQt5.QtWidgets import QApplication
+            from ai_handler import AIHandler
+            from ollama import OllamaAPI
+            self.app = QApplication.instance() or QApplication(sys.argv)
+            self.ai_handler = AIHandler(OllamaAPI(ollama_url, "fake"), "You are chatting with friends.", self.typer)
+
+    def timed(self, stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[stage].append(time.perf_counter() - start)
+        return result
+
+    def run_frame(self, capture):
+        # Same order of work as CaptureWorker.capture_region followed by StartAnalyzer.handle_new_text
+        start = time.perf_counter()
+        text = self.timed('ocr', capture) if callable(capture) else capture
+        lines = self.timed('parse', self.handler.process_captured_text, text)
+        new_text = self.timed('align', self.handler.get_new_text, lines)
+        if new_text:
+            self.timed('log', self.log_messages, new_text)
+            self.messages += len(new_text)
+            other_messages = [entry for entry in new_text if entry[0] != MY_USERNAME]
+            if other_messages and self.ai_handler is not None:
+                history = self.timed('history', get_last_messages, self.log_file, self.history)
+                username, message = other_messages[-1]
+                self.timed('reply', self.reply, username, message, history)
+        self.frame_timings.append(time.perf_counter() - start)
+
+    def log_messages(self, new_text):
+        append_batch_to_csv(self.log_file, "captured_conversation", new_text)
+
+    def reply(self, username, message, history):
+        from PyQt5.QtCore import QEventLoop, QTimer
+        loop = QEventLoop()
+        self.ai_handler.ai_response_complete.connect(loop.quit)
+        QTimer.singleShot(150000, loop.quit)  # Never hang on a dead server
+        self.ai_handler.process_new_message(username, message, None, history, self.log_file)
+        loop.exec_()
+        self.ai_handler.ai_response_complete.disconnect(loop.quit)
+
+    def results(self):
+        elapsed = sum(self.frame_timings)
+        return {
+            'frames': len(self.frame_timings),
+            'messages': self.messages,
+            'replies': len(self.typer.typed),
+            'frames_per_sec': len(self.frame_timings) / elapsed if elapsed else 0.0,
+            'messages_per_sec': self.messages / elapsed if elapsed else 0.0,
+            'frame': summarize(self.frame_timings),
+            'stages': {stage: summarize(timings) for stage, timings in self.timings.items() if timings},
+        }
+
+    def close(self):
+        self.handler.close()
+        close_conversation_log(self.log_file)
+        if conversation_log.store is not None:
+            conversation_log.store.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded chat frames through parsing, dedupe, logging and the AI reply")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--images', help="Folder or multi-frame file of chat screenshots (needs Tesseract)")
+    source.add_argument('--text', help="JSON list of OCR outputs or a folder of .txt frames (defaults to a synthetic chat)")
+    parser.add_argument('--messages', type=int, default=300, help="Length of the synthetic chat")
+    parser.add_argument('--noise', type=float, default=0.1, help="Share of visible lines misread per synthetic frame")
+    parser.add_argument('--repeats', type=float, default=0.1, help="Share of synthetic messages that repeat the one before")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tesseract-cmd', default=None)
+    parser.add_argument('--latency', type=float, default=0.2, help="Fake Ollama seconds before the first token")
+    parser.add_argument('--token-rate', type=float, default=50.0, help="Fake Ollama tokens per second")
+    parser.add_argument('--reply-tokens', type=int, default=20)
+    parser.add_argument('--max-replies', type=int, default=20, help="Frames after this many replies skip the reply stage")
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv', help="Conversation log storage")
+    parser.add_argument('--no-reply', action='store_true', help="Skip the AI reply stage")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    expected = None
+    if args.images:
+        window, frame_count = image_capture(args.images, args.tesseract_cmd)
+        frames = [window.capture_screen] * frame_count
+    elif args.text:
+        frames = text_frames(args.text)
+    else:
+        frames, expected = synthetic_frames(args.messages, 15, args.noise, args.seed, args.repeats)
+
+    server = None
+    if not args.no_reply:
+        server = FakeOllamaServer(latency=args.latency, token_rate=args.token_rate, reply_tokens=args.reply_tokens).start()
+    bench = PipelineBench(server.url if server else None, backend=args.backend)
+    try:
+        for frame in frames:
+            if bench.ai_handler is not None and len(bench.typer.typed) >= args.max_replies:
+                bench.ai_handler = None
+            bench.run_frame(frame)
+        results = bench.results()
+    finally:
+        bench.close()
+        if server:
+            server.stop()
+
+    print(f"frames={results['frames']}  messages={results['messages']}" + (f" of {expected}" if expected is not None else "") +
+          f"  replies={results['replies']}  throughput={results['frames_per_sec']:.1f} frames/s, {results['messages_per_sec']:.1f} messages/s")
+    # Without misreads every message, repeats included, must be logged exactly once. A misread
+    # username turns a line into a continuation of the message above, which can be logged again
+    if expected is not None and not args.noise and results['messages'] != expected:
+        print(f"WARNING: the synthetic chat has {expected} messages but {results['messages']} were logged")
+    print(format_summary("frame", results['frame']) + f"  p99={results['frame']['p99_ms']:9.3f} ms")
+    for stage, summary in results['stages'].items():
+        print(format_summary(stage, summary) + f"  p99={summary['p99_ms']:9.3f} ms")
+
+    if args.json:
+        results['config'] = {key: value for key, value in vars(args).items() if key != 'json'}
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
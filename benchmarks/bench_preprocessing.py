@@ -0,0 +1,89 @@
+import argparse
+import difflib
+import json
+import logging
+import os
+from bench_utils import time_calls, summarize, load_images, sample_chat_image
+from ocr_engine import create_ocr_engine
+from preprocessing import PreprocessingPipeline, DEFAULT_PIPELINE
+
+CANDIDATE_PIPELINES = {
+    'default': DEFAULT_PIPELINE,
+    'gray_invert': ["grayscale", "invert"],
+    'otsu': ["grayscale", "invert", "binarize"],
+    'adaptive': ["grayscale", "invert", "adaptive_threshold"],
+    'otsu_upscale2': ["grayscale", "invert", "binarize", {"stage": "upscale", "factor": 2}],
+    'cropped_contrast': ["grayscale", "invert", {"stage": "contrast", "factor": 2}, "crop_to_content"],
+}
+
+def load_samples(folder):
+    # Each screenshot may have a .txt file with the same name holding the expected text
+    samples = []
+    for name, image in load_images(folder):
+        truth_path = os.path.join(folder, os.path.splitext(name)[0] + '.txt')
+        truth = open(truth_path, encoding='utf-8').read() if os.path.exists(truth_path) else None
+        samples.append((name, image, truth))
+    return samples
+
+def synthetic_samples():
+    lines = ["Bob: are you going to the footy this season", "Harry: yeah mate wouldnt miss it",
+             "Bob: sweet, saturday arvo?", "Harry: sounds good see you at 5"]
+    dark = sample_chat_image(lines)
+    light = dark.point(lambda value: 255 - value)
+    return [("dark", dark, "\n".join(lines)), ("light", light, "\n".join(lines))]
+
+def accuracy(text, truth):
+    normalize = lambda value: " ".join(value.split())
+    return difflib.SequenceMatcher(None, normalize(text), normalize(truth)).ratio()
+
+def bench_pipelines(samples, pipelines, runs, engine=None):
+    results = {}
+    for label, stages in pipelines.items():
+        pipeline = PreprocessingPipeline(stages)
+        timings, scores = [], []
+        for _, image, truth in samples:
+            timings += time_calls(lambda: pipeline(image), runs)
+            if engine is not None and truth is not None:
+                scores.append(accuracy(engine.image_to_string(pipeline(image)), truth))
+        results[label] = summarize(timings)
+        results[label]['pipeline'] = pipeline.describe()
+        results[label]['accuracy'] = sum(scores) / len(scores) if scores else None
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare preprocessing pipelines by latency and OCR accuracy")
+    parser.add_argument('--images', help="Folder of chat screenshots with matching .txt ground truth files")
+    parser.add_argument('--pipelines', help="JSON file mapping a label to a list of stages, added to the built-in candidates")
+    parser.add_argument('--runs', type=int, default=20, help="Preprocessing runs per image")
+    parser.add_argument('--min-accuracy', type=float, default=0.95)
+    parser.add_argument('--no-ocr', action='store_true', help="Only measure preprocessing latency")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    samples = load_samples(args.images) if args.images else synthetic_samples()
+    pipelines = dict(CANDIDATE_PIPELINES)
+    if args.pipelines:
+        with open(args.pipelines, encoding='utf-8') as f:
+            pipelines.update(json.load(f))
+
+    engine = None
+    if not args.no_ocr:
+        try:
+            engine = create_ocr_engine()
+            engine.image_to_string(samples[0][1])
+        except Exception as e:
+            logging.error(f"OCR not available, reporting latency only: {str(e)}")
+            engine = None
+
+    results = bench_pipelines(samples, pipelines, args.runs, engine)
+    for label, result in sorted(results.items(), key=lambda item: item[1]['mean_ms']):
+        score = f"{result['accuracy']:.3f}" if result['accuracy'] is not None else "n/a"
+        print(f"{label:<18} mean={result['mean_ms']:8.3f} ms  p95={result['p95_ms']:8.3f} ms  accuracy={score:<6} {result['pipeline']}")
+
+    accurate = [(result['mean_ms'], label) for label, result in results.items()
+                if result['accuracy'] is not None and result['accuracy'] >= args.min_accuracy]
+    if accurate:
+        print(f"Fastest pipeline with accuracy >= {args.min_accuracy}: {min(accurate)[1]}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import argparse
+import json
+import random
+from bench_utils import mean_time
+from ignore_matcher import get_ignore_matcher
+from transcript_parser import TranscriptParser
+
+def legacy_parse(text, my_username, other_usernames, ignored_patterns):
+    # The per-line, per-username loop CaptureHandler used before the shared parser
+    ignore_matcher = get_ignore_matcher(ignored_patterns)
+    processed_lines = []
+    current_username = None
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or ignore_matcher.matches(line):
+            continue
+        for username in [my_username] + other_usernames:
+            if line.lower().startswith(username.lower()):
+                current_username = username
+                message = line[len(username):].strip()
+                if message.startswith(':'):
+                    message = message[1:].strip()
+                processed_lines.append((current_username, message))
+                break
+        else:
+            if current_username:
+                processed_lines.append((current_username, line))
+    return processed_lines
+
+def make_roster(size):
+    # Fixed width names so no username is a prefix of another and both parsers must agree
+    return [f"Player{i:04d}" for i in range(size)]
+
+def make_frame(roster, lines, seed=0):
+    rng = random.Random(seed)
+    words = ["lol", "yeah", "gg", "anyone up for a game", "brb", "where is everyone", "nice one", "same"]
+    frame = []
+    for _ in range(lines):
+        if rng.random() < 0.2:
+            frame.append(rng.choice(words))  # Wrapped continuation line
+        else:
+            frame.append(f"{rng.choice(roster).lower() if rng.random() < 0.1 else rng.choice(roster)}: {rng.choice(words)}")
+    return '\n'.join(frame)
+
+def per_frame_ms(func, rounds):
+    return mean_time(func, rounds) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript parsing cost as the username roster grows")
+    parser.add_argument('--rosters', default="2,10,50,100,500", help="Comma separated roster sizes")
+    parser.add_argument('--lines', type=int, default=200, help="OCR lines per frame")
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(value) for value in args.rosters.split(',')]:
+        roster = make_roster(size)
+        my_username, other_usernames = roster[0], roster[1:]
+        text = make_frame(roster, args.lines)
+        transcript_parser = TranscriptParser(my_username, other_usernames)
+        assert transcript_parser.parse(text) == legacy_parse(text, my_username, other_usernames, [])
+
+        legacy = per_frame_ms(lambda: legacy_parse(text, my_username, other_usernames, []), args.rounds)
+        trie = per_frame_ms(lambda: transcript_parser.parse(text), args.rounds)
+        results.append({'usernames': size, 'lines': args.lines, 'legacy_ms': legacy, 'parser_ms': trie})
+        print(f"{size:>5} usernames  legacy={legacy:9.3f} ms/frame  parser={trie:8.3f} ms/frame  speedup={legacy / trie:6.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
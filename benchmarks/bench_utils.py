@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+# Benchmarks run from the benchmarks folder, make the application modules importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def time_calls(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def mean_time(func, runs):
+    # Seconds per call, timed over the whole loop so very fast calls are not lost in timer overhead
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - start) / runs
+
+def summarize(timings):
+    return {
+        'runs': len(timings),
+        'mean_ms': sum(timings) / len(timings) * 1000 if timings else 0.0,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+    }
+
+def format_summary(label, summary):
+    return (f"{label:<32} runs={summary['runs']:<5} mean={summary['mean_ms']:9.3f} ms  "
+            f"p50={summary['p50_ms']:9.3f} ms  p95={summary['p95_ms']:9.3f} ms")
+
+def load_images(folder):
+    from PIL import Image
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
+            with Image.open(os.path.join(folder, name)) as image:
+                images.append((name, image.copy()))
+    return images
+
+def sample_chat_image(lines=None, width=420):
+    # Synthetic chat screenshot used when no recorded screenshots are given
+    from PIL import Image, ImageDraw
+    lines = lines or ["Bob: are you going to the footy this season", "Harry: yeah mate wouldnt miss it",
+                      "Bob: sweet, saturday arvo?", "Harry: sounds good see you at 5"]
+    image = Image.new('RGB', (width, 20 + 18 * len(lines)), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((8, 10 + 18 * i), line, fill=(230, 230, 230))
+    return image
\ No newline at end of file
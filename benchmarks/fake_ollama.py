@@ -0,0 +1,98 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOllamaServer:
+    # Local stand-in for the Ollama HTTP API. /api/generate answers after latency seconds plus one
+    # token per 1/token_rate seconds, as one JSON body or as streamed NDJSON chunks like Ollama does
+    def __init__(self, host='127.0.0.1', port=0, latency=0.2, token_rate=50.0, reply_tokens=20):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.request_count = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, body, status=200):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/api/tags':
+                    self.send_json({'models': [{'name': 'fake'}]})
+                else:
+                    self.send_json({'error': 'not found'}, 404)
+
+            def do_POST(self):
+                if self.path != '/api/generate':
+                    self.send_json({'error': 'not found'}, 404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                fake.request_count += 1
+                tokens = [f"word{i} " for i in range(fake.reply_tokens)]
+                token_delay = 1.0 / fake.token_rate if fake.token_rate > 0 else 0.0
+                started = time.perf_counter()
+                time.sleep(fake.latency)
+
+                if request.get('stream', True):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/x-ndjson')
+                    self.end_headers()
+                    for token in tokens:
+                        time.sleep(token_delay)
+                        self.wfile.write(json.dumps({'model': request.get('model'), 'response': token, 'done': False}).encode('utf-8') + b'\n')
+                        self.wfile.flush()
+                    self.wfile.write(json.dumps({'model': request.get('model'), 'response': '', 'done': True}).encode('utf-8') + b'\n')
+                else:
+                    time.sleep(token_delay * len(tokens))
+                    self.send_json({'model': request.get('model'), 'response': ''.join(tokens).strip(), 'done': True,
+                                    'total_duration': int((time.perf_counter() - started) * 1e9),
+                                    'eval_count': len(tokens)})
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stand-in Ollama server with fixed latency and token rate")
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument('--token-rate', type=float, default=50.0, help="Tokens per second")
+    parser.add_argument('--reply-tokens', type=int, default=20)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(port=args.port, latency=args.latency, token_rate=args.token_rate, reply_tokens=args.reply_tokens)
+    print(f"Fake Ollama listening on {server.url}, set ollama_url to it")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,24 +1,100 @@
-from PyQt5.QtCore import QThread, pyqtSignal
-from utils import process_captured_text
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from capture_scheduler import AdaptiveCaptureScheduler
+from metrics import metrics
+from profiling import profiler
 
-class CaptureThread(QThread):
-    capture_complete = pyqtSignal(list)
+class CaptureWorker(QObject):
+    # Lives on its own QThread: probing, grabbing, preprocessing, OCR and parsing all run here and
+    # only the parsed lines are posted back to the GUI thread. The worker handles one request at a
+    # time, and the single-shot scheduler timer is only re-armed once a tick has finished.
+    # Regions that changed in the same tick are captured side by side on up to capture_workers
+    # threads, which all feed the shared OCR engine.
+    new_text_ready = pyqtSignal(int, list)
+    initial_capture_ready = pyqtSignal(int, list, bool)
 
-    def __init__(self, analyzer_window, my_username, other_usernames, ignored_patterns):
+    def __init__(self, regions, probe_min_interval, max_interval, capture_workers=1):
         super().__init__()
-        self.analyzer_window = analyzer_window
-        self.my_username = my_username
-        self.other_usernames = other_usernames
-        self.ignored_patterns = ignored_patterns
+        self.regions = regions
+        self.capture_workers = max(1, min(capture_workers, len(regions)))
+        self.pool = ThreadPoolExecutor(max_workers=self.capture_workers, thread_name_prefix="capture") if self.capture_workers > 1 else None
+        # Created as a child so moveToThread takes the scheduler and its timer along
+        self.capture_scheduler = AdaptiveCaptureScheduler([region.analyzer_window.probe for region in regions],
+                                                          probe_min_interval, max_interval, parent=self)
+        self.capture_scheduler.capture_requested.connect(self.perform_capture)
 
-    def run(self):
+    # index None means every region
+    @pyqtSlot(object)
+    def start_scheduler(self, index):
+        self.capture_scheduler.start(index)
+
+    @pyqtSlot(object)
+    def resume_scheduler(self, index):
+        self.capture_scheduler.resume(index)
+
+    @pyqtSlot(object)
+    def stop_scheduler(self, index):
+        self.capture_scheduler.stop(index)
+
+    @pyqtSlot(float, float)
+    def set_scheduler_intervals(self, min_interval, max_interval):
+        self.capture_scheduler.update_intervals(min_interval, max_interval)
+
+    def run_regions(self, capture, indexes):
+        # Results come back in the order of indexes, which the scheduler already rotates for fairness
+        if self.pool is None or len(indexes) == 1:
+            return [capture(index) for index in indexes]
+        return list(self.pool.map(capture, indexes))
+
+    def capture_region(self, index):
+        region = self.regions[index]
+        with metrics.time('capture'):
+            captured_text = region.analyzer_window.capture_screen()
         try:
-            logging.debug("CaptureThread started")
-            text = self.analyzer_window.capture_screen()
-            logging.debug(f"Raw captured text: {text[:100]}...")  # Log first 100 characters
-            processed_lines = process_captured_text(text, self.my_username, self.other_usernames, self.ignored_patterns)
-            logging.debug(f"Processed lines: {processed_lines}")
-            self.capture_complete.emit(processed_lines)
+            processed_lines = region.capture_handler.process_captured_text(captured_text)
+            return region.capture_handler.get_new_text(processed_lines)
         except Exception as e:
-            logging.error(f"Error in CaptureThread: {str(e)}", exc_info=True)
\ No newline at end of file
+            logging.error(f"Error parsing captured text from {region.name}: {str(e)}")
+            region.analyzer_window.dump_debug_frames("parse error")
+            return []
+
+    @pyqtSlot(list)
+    def perform_capture(self, indexes):
+        logging.info(f"Screen changed in {', '.join(self.regions[index].name for index in indexes)}, capturing")
+        # With a capture pool the regions are read on pool threads, which the profile does not see
+        with profiler.profile('capture'):
+            results = self.run_regions(self.capture_region, indexes)
+        for index, new_text in zip(indexes, results):
+            if new_text:
+                # Hold the region's next tick until the GUI thread has logged the lines and decided whether to reply
+                self.capture_scheduler.stop(index)
+                self.new_text_ready.emit(index, new_text)
+            else:
+                logging.info(f"No new text found in {self.regions[index].name}")
+
+    def initial_capture_region(self, index):
+        region = self.regions[index]
+        try:
+            captured_text = region.analyzer_window.capture_screen(force=True)
+            processed_lines = region.capture_handler.process_captured_text(captured_text)
+            # The aligner is primed with everything on screen so later captures only report what
+            # follows it, the log only gets what arrived while the app was not capturing
+            region.capture_handler.reset_capture_state()
+            region.capture_handler.aligner.new_entries(processed_lines)
+            return region.capture_handler.filter_unseen(processed_lines), True
+        except Exception as e:
+            logging.error(f"Error during initial capture of {region.name}: {str(e)}")
+            region.analyzer_window.dump_debug_frames("capture restart error")
+            return [], False
+
+    @pyqtSlot()
+    def initial_capture(self):
+        indexes = list(range(len(self.regions)))
+        for index, (processed_lines, success) in zip(indexes, self.run_regions(self.initial_capture_region, indexes)):
+            self.initial_capture_ready.emit(index, processed_lines, success)
+
+    def close(self):
+        # Called once the worker thread has stopped
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
\ No newline at end of file
@@ -1,21 +1,36 @@
 import logging
 from PyQt5.QtCore import QObject, pyqtSignal
-from utils import append_to_csv, is_ignored_line
+from utils import append_to_csv
+from transcript_parser import get_transcript_parser
+from transcript_alignment import TranscriptAligner
+from dedupe_index import DedupeIndex
+from metrics import metrics
 
 class CaptureHandler:
-    def __init__(self, analyzer_window, my_username, other_usernames, ignored_patterns):
+    def __init__(self, analyzer_window, my_username, other_usernames, ignored_patterns, dedupe_capacity=2000, seen_index=None):
         self.analyzer_window = analyzer_window
         self.my_username = my_username
         self.other_usernames = other_usernames
         self.ignored_patterns = ignored_patterns
+        self.parser = get_transcript_parser(my_username, other_usernames, ignored_patterns)
         self.log_file = None
-        self.last_captured_text = None
+        self.aligner = TranscriptAligner(DedupeIndex(dedupe_capacity))
+        self.seen_index = seen_index  # Messages logged in earlier runs, persisted across restarts
 
     def set_log_file(self, log_file):
         self.log_file = log_file
 
+    def update_settings(self, my_username, other_usernames, ignored_patterns):
+        # The parser is only rebuilt when the usernames or ignore patterns actually changed
+        if (my_username, list(other_usernames), list(ignored_patterns)) != (self.my_username, list(self.other_usernames), list(self.ignored_patterns)):
+            self.my_username = my_username
+            self.other_usernames = other_usernames
+            self.ignored_patterns = ignored_patterns
+            self.parser = get_transcript_parser(my_username, other_usernames, ignored_patterns)
+            logging.info(f"Parser updated ({len(other_usernames) + 1} usernames, {len(ignored_patterns)} ignore patterns)")
+
     def reset_capture_state(self):
-        self.last_captured_text = None
+        self.aligner.reset()
 
     def start_capture(self):
         try:
@@ -38,34 +53,29 @@ class CaptureHandler:
             return []
 
     def process_captured_text(self, text):
-        lines = text.split('\n')
-        processed_lines = []
-        current_username = None
-
-        for line in lines:
-            line = line.strip()
-            if not line or is_ignored_line(line, self.ignored_patterns):
-                continue
-
-            for username in [self.my_username] + self.other_usernames:
-                if line.lower().startswith(username.lower()):
-                    current_username = username
-                    message = line[len(username):].strip()
-                    if message.startswith(':'):
-                        message = message[1:].strip()
-                    processed_lines.append((current_username, message))
-                    break
-            else:
-                if current_username:
-                    processed_lines.append((current_username, line))
-
-        return processed_lines
+        with metrics.time('parse'):
+            return self.parser.parse(text)
 
     def get_new_text(self, processed_lines):
-        if self.last_captured_text is None:
-            self.last_captured_text = processed_lines
+        # An unchanged frame yields no lines, keep aligning against the last frame that had text
+        if not processed_lines:
+            return []
+        with metrics.time('align'):
+            new_text = self.aligner.new_entries(processed_lines)
+            if self.seen_index is None or not new_text:
+                return new_text
+            # After the initial capture the aligner decides what is new, a message repeated later in
+            # the chat is kept
+            first_new = len(processed_lines) - len(new_text)
+            self.seen_index.record(new_text, processed_lines[first_new - 1] if first_new else None)
+            return new_text
+
+    def filter_unseen(self, processed_lines):
+        # The visible chat after a restart, only what was not logged before it is new
+        if self.seen_index is None:
             return processed_lines
-        
-        new_text = [line for line in processed_lines if line not in self.last_captured_text]
-        self.last_captured_text = processed_lines
-        return new_text
\ No newline at end of file
+        return self.seen_index.filter_new(processed_lines)
+
+    def close(self):
+        if self.seen_index is not None:
+            self.seen_index.close()
\ No newline at end of file
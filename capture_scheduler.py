@@ -0,0 +1,120 @@
+import logging
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+class ProbeSlot:
+    def __init__(self, probe, interval):
+        self.probe = probe
+        self.interval = interval
+        self.last_fingerprint = None
+        self.due = 0.0
+        self.active = False
+
+class AdaptiveCaptureScheduler(QObject):
+    # Polls a cheap pixel-change probe per capture region and only asks for a full capture of the
+    # regions whose probe saw a change. While a region stays idle its probe interval doubles up to
+    # max_interval, any change resets it. All regions share one timer and are probed round-robin.
+    capture_requested = pyqtSignal(list)
+
+    def __init__(self, probes, min_interval, max_interval, backoff=2.0, parent=None):
+        super().__init__(parent)
+        self.backoff = backoff
+        self.set_intervals(min_interval, max_interval)
+        self.slots = [ProbeSlot(probe, self.min_interval) for probe in probes]
+        self.next_index = 0  # Region probed first on the next tick, rotated for fairness
+        self.probe_count = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_probe)
+
+    @property
+    def running(self):
+        return any(slot.active for slot in self.slots)
+
+    def set_intervals(self, min_interval, max_interval):
+        self.min_interval = max(0.1, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+
+    def update_intervals(self, min_interval, max_interval):
+        # New bounds while running. Idle regions keep their backoff within the new bounds and a
+        # region now waiting longer than the new max is probed sooner
+        self.set_intervals(min_interval, max_interval)
+        now = time.monotonic()
+        for slot in self.slots:
+            slot.interval = min(max(slot.interval, self.min_interval), self.max_interval)
+            slot.due = min(slot.due, now + slot.interval)
+        if self.running:
+            self.reschedule()
+
+    def selected_slots(self, index):
+        return self.slots if index is None else [self.slots[index]]
+
+    def start(self, index=None):
+        # Forget the last fingerprint so the first probe after a (re)start always triggers a capture
+        for slot in self.selected_slots(index):
+            slot.last_fingerprint = None
+            slot.interval = self.min_interval
+            slot.due = time.monotonic() + slot.interval
+            slot.active = True
+        self.reschedule()
+
+    def resume(self, index=None):
+        # Carry on probing from the current interval without forcing a capture
+        for slot in self.selected_slots(index):
+            if not slot.active:
+                slot.due = time.monotonic() + slot.interval
+                slot.active = True
+        self.reschedule()
+
+    def stop(self, index=None):
+        for slot in self.selected_slots(index):
+            slot.active = False
+        if not self.running:
+            self.timer.stop()
+
+    def reschedule(self):
+        # Arm the single timer for the earliest region due
+        due = [slot.due for slot in self.slots if slot.active]
+        if due:
+            self.timer.start(max(0, int((min(due) - time.monotonic()) * 1000)))
+
+    # Decorated so queued timer callbacks run in the thread the scheduler lives in
+    @pyqtSlot()
+    def run_probe(self):
+        now = time.monotonic()
+        changed = []
+        order = [(self.next_index + i) % len(self.slots) for i in range(len(self.slots))]
+        for index in order:
+            slot = self.slots[index]
+            # Small tolerance so regions due within the same timer slack share a tick
+            if not slot.active or slot.due > now + 0.05:
+                continue
+
+            self.probe_count += 1
+            try:
+                fingerprint = slot.probe()
+            except Exception as e:
+                logging.error(f"Error probing capture region {index}: {str(e)}")
+                fingerprint = slot.last_fingerprint
+
+            if fingerprint != slot.last_fingerprint:
+                slot.last_fingerprint = fingerprint
+                slot.interval = self.min_interval
+                changed.append(index)
+            else:
+                slot.interval = min(slot.interval * self.backoff, self.max_interval)
+                logging.debug(f"Capture region {index} idle, next probe in {slot.interval:.1f} sec")
+            slot.due = now + slot.interval
+            self.next_index = (index + 1) % len(self.slots)
+
+        if changed:
+            logging.debug(f"Capture regions {changed} changed, requesting a full capture")
+            self.capture_requested.emit(changed)
+            # Count the wait from the end of the capture, not from the probe
+            finished = time.monotonic()
+            for index in changed:
+                self.slots[index].due = finished + self.slots[index].interval
+
+        # A slot connected to capture_requested may have stopped or restarted the scheduler
+        if self.running and not self.timer.isActive():
+            self.reschedule()
\ No newline at end of file
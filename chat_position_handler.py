@@ -2,6 +2,7 @@ import logging
 from PyQt5.QtCore import QObject, pyqtSignal, QTimer
 from PyQt5.QtWidgets import QMessageBox
 import pyautogui
+from metrics import metrics
 
 class ChatPositionHandler(QObject):
     position_set = pyqtSignal(int, int)
@@ -35,10 +36,13 @@ class ChatPositionHandler(QObject):
         else:
             logging.warning("Attempted to click chat input, but position is not set.")
 
-    def type_message(self, message):
-        if self.chat_input_position:
-            pyautogui.click(self.chat_input_position.x, self.chat_input_position.y)
-            pyautogui.typewrite(message)
-            pyautogui.press('enter')
+    def type_message(self, message, position=None):
+        # position overrides the stored one when replying into another chat
+        position = position or self.chat_input_position
+        if position:
+            with metrics.time('typing'):
+                pyautogui.click(position.x, position.y)
+                pyautogui.typewrite(message)
+                pyautogui.press('enter')
         else:
             logging.warning("Attempted to type message, but chat input position is not set.")
\ No newline at end of file
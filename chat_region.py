@@ -0,0 +1,35 @@
+import logging
+from conversation_log import close_conversation_log
+
+# Per-region keys, anything a region leaves out falls back to the top level settings
+REGION_KEYS = ('my_username', 'other_usernames', 'ignored_lines', 'chat_input_position')
+
+def region_configs(settings):
+    # The top level settings describe the first region, settings['regions'] adds more
+    primary = {key: settings.get(key) for key in REGION_KEYS}
+    primary['name'] = "Chat 1"
+    configs = [primary]
+    for i, region in enumerate(settings.get('regions') or [], start=2):
+        config = dict(primary)
+        config.update(region)
+        config['name'] = region.get('name', f"Chat {i}")
+        configs.append(config)
+    return configs
+
+class ChatRegion:
+    # One watched chat: its capture window, parser state, CSV log and where replies are typed
+    def __init__(self, name, analyzer_window, capture_handler, chat_position_handler):
+        self.name = name
+        self.analyzer_window = analyzer_window
+        self.capture_handler = capture_handler
+        self.chat_position_handler = chat_position_handler
+        self.log_file = None
+        self.waiting_for_ollama = False
+        self.reply_started = None  # perf_counter() when the chat was handed to Ollama
+
+    def set_log_file(self, log_file):
+        if self.log_file and self.log_file != log_file:
+            close_conversation_log(self.log_file)
+        self.log_file = log_file
+        self.capture_handler.set_log_file(log_file)
+        logging.info(f"{self.name} logging to {log_file}")
\ No newline at end of file
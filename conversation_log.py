@@ -0,0 +1,221 @@
+import atexit
+import csv
+import io
+import logging
+import os
+import re
+import threading
+import time
+from conversation_store import SQLiteConversationStore, SQLiteConversationLog
+from log_manager import log_manager
+
+HEADER = ["ID", "Conversation", "Username", "Message"]
+FLUSH_POLICIES = ('cycle', 'interval', 'close')
+TAIL_BLOCK = 64 * 1024
+ROW_START = re.compile(r"(?m)^\d+,")
+
+def parse_rows(text):
+    try:
+        rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+    except csv.Error:
+        return None
+    return rows if all(len(row) == len(HEADER) and row[0].isdigit() for row in rows) else None
+
+def read_tail_rows(path, count):
+    # Last count rows (all when count <= 0), read backwards from the end in growing blocks, so the
+    # cost depends on count and not on the length of the log. A message may contain line breaks,
+    # so a candidate row start only counts when everything after it parses as complete rows
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        block = max(4096, count * 256) if count > 0 else size
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            tail = f.read(size - start).decode('utf-8', errors='replace')
+            rows = None
+            for match in ROW_START.finditer(tail):
+                if match.start() == 0 and start > 0:
+                    continue  # May be the middle of a line
+                rows = parse_rows(tail[match.start():])
+                if rows is not None:
+                    break
+            if start == 0 or (rows and len(rows) >= count > 0):
+                rows = rows or []
+                return rows[-count:] if count > 0 else rows
+            block *= 4
+
+def read_last_id(path):
+    rows = read_tail_rows(path, 1)
+    return int(rows[-1][0]) if rows else 0
+
+class ConversationLog:
+    # One conversation CSV kept open for appending. The next ID lives in memory, recovered once from
+    # the tail of the file, so an append costs the same for a 50 line log as for a 50k line one.
+    # Rows are buffered until flushed: after each capture cycle, every flush_interval seconds or on
+    # close, depending on flush_policy.
+    # Flushes are all or nothing: before unflushed rows can reach the file, the size of the file as
+    # of the last flush is written to <log>.journal, which is removed once the rows are synced. A
+    # journal left by a crash means rows of an unfinished flush may be on disk, they are cut off on open.
+    def __init__(self, path, flush_policy='cycle'):
+        self.path = path
+        self.journal = f"{path}.journal"
+        self.flush_policy = flush_policy
+        self.lock = threading.Lock()
+        self.pending = 0  # Rows written since the last flush
+        log_manager.restore(path)  # Decompressed again if it was closed and compacted meanwhile
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, mode='w', newline='', encoding='utf-8') as file:
+                csv.writer(file).writerow(HEADER)
+        self.recover()
+        self.next_id = read_last_id(path) + 1
+        self.file = open(path, mode='ab', buffering=TAIL_BLOCK)
+        self.committed = self.file.tell()
+
+    def recover(self):
+        if not os.path.exists(self.journal):
+            return
+        with open(self.journal) as f:
+            committed = int(f.read().strip() or 0)
+        with open(self.path, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size > committed:
+                f.truncate(committed)
+                logging.warning(f"Discarded {size - committed} bytes of an unfinished write to {self.path}")
+        os.remove(self.journal)
+
+    def write_rows(self, rows):
+        # Called with the lock held. Rows are encoded together and handed to the buffer in one write
+        if not self.pending:
+            with open(self.journal, 'w') as f:
+                f.write(str(self.committed))
+                f.flush()
+                os.fsync(f.fileno())
+        text = io.StringIO(newline='')
+        first_id = self.next_id
+        csv.writer(text).writerows([f"{first_id + i:04d}"] + list(row) for i, row in enumerate(rows))
+        self.file.write(text.getvalue().encode('utf-8'))
+        self.next_id += len(rows)
+        self.pending += len(rows)
+        return first_id
+
+    def append(self, conversation_type, username, message):
+        with self.lock:
+            return self.write_rows([(conversation_type, username, message)])
+
+    def append_batch(self, rows):
+        # rows are (conversation_type, username, message). IDs are given out in one go and the rows
+        # land together, or not at all if the app dies before the flush
+        if not rows:
+            return None
+        with self.lock:
+            return self.write_rows(rows)
+
+    def flush(self):
+        with self.lock:
+            if self.pending and not self.file.closed:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.committed = self.file.tell()
+                os.remove(self.journal)
+                self.pending = 0
+
+    def end_cycle(self):
+        if self.flush_policy == 'cycle':
+            self.flush()
+
+    def last_messages(self, n):
+        self.flush()
+        return [(row[2], row[3]) for row in read_tail_rows(self.path, n)]
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+open_logs = {}
+open_logs_lock = threading.Lock()
+default_flush_policy = 'cycle'
+# log_backend setting: new conversations go to CSV files or to the SQLite store at database_path
+backend = 'csv'
+database_path = './logs/conversations.db'
+store = None
+
+def set_backend(name, path):
+    global backend, database_path, store
+    if name not in ('csv', 'sqlite'):
+        logging.warning(f"Unknown log backend '{name}', using csv")
+        name = 'csv'
+    if store is not None and os.path.abspath(path) != os.path.abspath(database_path):
+        close_conversation_logs()
+        store.close()
+        store = None
+    backend, database_path = name, path
+
+def get_store():
+    global store
+    with open_logs_lock:
+        if store is None:
+            store = SQLiteConversationStore(database_path)
+            logging.info(f"Conversation store: {database_path}")
+        return store
+
+def create_conversation(chat=None):
+    # Only for the SQLite backend, CSV logs are created by utils.create_new_log_file
+    return get_store().create_conversation(chat=chat)
+
+def latest_conversation(chat):
+    return get_store().latest_conversation(chat)
+
+def is_csv_log(log_file):
+    # Logs are named by their CSV path, or by their conversation name in the SQLite store
+    return log_file.lower().endswith('.csv')
+
+def set_flush_policy(policy):
+    global default_flush_policy
+    if policy not in FLUSH_POLICIES:
+        logging.warning(f"Unknown log flush policy '{policy}', using 'cycle'")
+        policy = 'cycle'
+    default_flush_policy = policy
+    with open_logs_lock:
+        for log in open_logs.values():
+            log.flush_policy = policy
+
+def open_conversation_log(path):
+    key = os.path.abspath(path) if is_csv_log(path) else path
+    log_store = None if is_csv_log(path) else get_store()
+    with open_logs_lock:
+        log = open_logs.get(key)
+        if log is None:
+            start = time.perf_counter()
+            if log_store is None:
+                log = ConversationLog(path, default_flush_policy)
+            else:
+                log = SQLiteConversationLog(log_store, path, default_flush_policy)
+            open_logs[key] = log
+            logging.debug(f"Opened {path} at ID {log.next_id} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return log
+
+def close_conversation_log(path):
+    # A reply that arrives later for a closed log simply reopens it
+    with open_logs_lock:
+        log = open_logs.pop(os.path.abspath(path) if is_csv_log(path) else path, None)
+    if log is not None:
+        log.close()
+    if is_csv_log(path):
+        log_manager.log_closed(path)
+
+def flush_conversation_logs():
+    with open_logs_lock:
+        logs = list(open_logs.values())
+    for log in logs:
+        log.flush()
+
+def close_conversation_logs():
+    with open_logs_lock:
+        logs = list(open_logs.values())
+        open_logs.clear()
+    for log in logs:
+        log.close()
+
+atexit.register(close_conversation_logs)
\ No newline at end of file
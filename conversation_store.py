@@ -0,0 +1,202 @@
+import argparse
+import csv
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from log_manager import open_log_text, LOG_NAME
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    chat TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id),
+    row_id INTEGER NOT NULL,
+    time REAL NOT NULL,
+    type TEXT NOT NULL,
+    username TEXT NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, row_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_by_time ON messages (conversation_id, time);
+CREATE INDEX IF NOT EXISTS messages_by_username ON messages (username, time);
+"""
+
+class SQLiteConversationStore:
+    # All conversations in one SQLite file. WAL mode lets the history be read while a capture cycle
+    # commits, and each cycle's rows go in as one transaction
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Stores created before conversations were tagged with their chat
+        if 'chat' not in [column[1] for column in self.connection.execute("PRAGMA table_info(conversations)")]:
+            self.connection.execute("ALTER TABLE conversations ADD COLUMN chat TEXT")
+
+    def create_conversation(self, prefix="chatlog", chat=None):
+        with self.lock, self.connection:
+            next_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM conversations").fetchone()[0]
+            name = f"{prefix}{next_id:04d}"
+            # Imported logs keep their file names, which may already use this number
+            while self.connection.execute("SELECT 1 FROM conversations WHERE name = ?", (name,)).fetchone():
+                next_id += 1
+                name = f"{prefix}{next_id:04d}"
+            self.connection.execute("INSERT INTO conversations (id, name, created, chat) VALUES (?, ?, ?, ?)", (next_id, name, time.time(), chat))
+        return name
+
+    def latest_conversation(self, chat):
+        with self.lock:
+            row = self.connection.execute("SELECT name FROM conversations WHERE chat = ? ORDER BY id DESC LIMIT 1", (chat,)).fetchone()
+        return row[0] if row else None
+
+    def conversation_id(self, name, create=True):
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT id FROM conversations WHERE name = ?", (name,)).fetchone()
+            if row:
+                return row[0]
+            if not create:
+                return None
+            return self.connection.execute("INSERT INTO conversations (name, created) VALUES (?, ?)", (name, time.time())).lastrowid
+
+    def last_row_id(self, conversation_id):
+        with self.lock:
+            return self.connection.execute("SELECT COALESCE(MAX(row_id), 0) FROM messages WHERE conversation_id = ?",
+                                           (conversation_id,)).fetchone()[0]
+
+    def insert(self, conversation_id, rows):
+        # rows are (row_id, time, type, username, message), written in a single transaction
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT INTO messages (conversation_id, row_id, time, type, username, message) VALUES (?, ?, ?, ?, ?, ?)",
+                                        [(conversation_id,) + tuple(row) for row in rows])
+
+    def last_messages(self, conversation_id, n):
+        with self.lock:
+            rows = self.connection.execute("SELECT username, message FROM messages WHERE conversation_id = ? ORDER BY row_id DESC LIMIT ?",
+                                           (conversation_id, n)).fetchall()
+        return rows[::-1]
+
+    def all_messages(self, conversation_id):
+        with self.lock:
+            return self.connection.execute("SELECT username, message FROM messages WHERE conversation_id = ? ORDER BY row_id",
+                                           (conversation_id,)).fetchall()
+
+    def messages_from(self, username, since=0.0):
+        # Every conversation, e.g. everything Bob said this week
+        with self.lock:
+            return self.connection.execute("SELECT c.name, m.time, m.message FROM messages m JOIN conversations c ON c.id = m.conversation_id "
+                                           "WHERE m.username = ? AND m.time >= ? ORDER BY m.time", (username, since)).fetchall()
+
+    def messages_needing_reply(self, conversation_id, my_username):
+        # Messages from other users after the last thing we said, by hand or through Ollama
+        with self.lock:
+            return self.connection.execute(
+                "SELECT username, message FROM messages WHERE conversation_id = ? AND username != ? AND type != 'ollama_auto_reply' "
+                "AND row_id > (SELECT COALESCE(MAX(row_id), 0) FROM messages WHERE conversation_id = ? AND (username = ? OR type = 'ollama_auto_reply')) "
+                "ORDER BY row_id", (conversation_id, my_username, conversation_id, my_username)).fetchall()
+
+    def import_csv(self, path):
+        # CSV logs have no timestamps, imported rows get the file's modification time
+        name = os.path.basename(path).split('.')[0]
+        if self.conversation_id(name, create=False) is not None:
+            logging.info(f"{name} already imported, skipped")
+            return 0
+        modified = os.path.getmtime(path)
+        with open_log_text(path.rsplit('.csv', 1)[0] + '.csv') as file:
+            reader = csv.reader(file)
+            next(reader, None)  # Skip header
+            rows = [(int(row[0]), modified, row[1], row[2], row[3]) for row in reader if len(row) == 4 and row[0].isdigit()]
+        with self.lock, self.connection:
+            conversation_id = self.connection.execute("INSERT INTO conversations (name, created) VALUES (?, ?)", (name, modified)).lastrowid
+            self.connection.executemany("INSERT OR IGNORE INTO messages (conversation_id, row_id, time, type, username, message) VALUES (?, ?, ?, ?, ?, ?)",
+                                        [(conversation_id,) + row for row in rows])
+        logging.info(f"Imported {len(rows)} messages from {path} as {name}")
+        return len(rows)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+class SQLiteConversationLog:
+    # Same interface as the CSV ConversationLog. Rows wait in memory and each flush inserts them in one transaction
+    def __init__(self, store, name, flush_policy='cycle'):
+        self.store = store
+        self.path = name
+        self.flush_policy = flush_policy
+        self.lock = threading.Lock()
+        self.conversation_id = store.conversation_id(name)
+        self.next_id = store.last_row_id(self.conversation_id) + 1
+        self.pending = []
+
+    def append(self, conversation_type, username, message):
+        with self.lock:
+            row_id = self.next_id
+            self.pending.append((row_id, time.time(), conversation_type, username, message))
+            self.next_id += 1
+        return row_id
+
+    def append_batch(self, rows):
+        # One transaction at the next flush, so the batch is stored whole or not at all
+        if not rows:
+            return None
+        with self.lock:
+            first_id = self.next_id
+            now = time.time()
+            self.pending += [(first_id + i, now) + tuple(row) for i, row in enumerate(rows)]
+            self.next_id += len(rows)
+        return first_id
+
+    def flush(self):
+        with self.lock:
+            rows, self.pending = self.pending, []
+        if rows:
+            self.store.insert(self.conversation_id, rows)
+
+    def end_cycle(self):
+        if self.flush_policy == 'cycle':
+            self.flush()
+
+    def last_messages(self, n):
+        self.flush()
+        if n > 0:
+            return self.store.last_messages(self.conversation_id, n)
+        return self.store.all_messages(self.conversation_id)
+
+    def messages_needing_reply(self, my_username):
+        self.flush()
+        return self.store.messages_needing_reply(self.conversation_id, my_username)
+
+    def close(self):
+        self.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import CSV chat logs into the SQLite conversation store")
+    parser.add_argument('logs', nargs='*', default=['./logs'], help="CSV files (compressed or not) or folders of chatlog*.csv")
+    parser.add_argument('--database', default='./logs/conversations.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    store = SQLiteConversationStore(args.database)
+    paths = []
+    for source in args.logs:
+        if os.path.isdir(source):
+            paths += sorted(path for path in glob.glob(os.path.join(source, 'chatlog*')) if LOG_NAME.match(os.path.basename(path)))
+        else:
+            paths.append(source)
+    total = sum(store.import_csv(path) for path in paths)
+    logging.info(f"{total} messages from {len(paths)} logs in {args.database}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,124 @@
+import difflib
+import hashlib
+import re
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Character runs and characters Tesseract tends to swap, folded to one form before lines are compared
+CONFUSABLE_RUNS = [('rn', 'm'), ('vv', 'w'), ('cl', 'd')]
+CONFUSABLES = str.maketrans({'0': 'o', '1': 'l', 'i': 'l', '|': 'l', '5': 's', '8': 'b'})
+NOT_WORD = re.compile(r"[\W_]+")
+DIGITS = re.compile(r"\d+")
+
+def normalize_text(text):
+    # Case, spacing, punctuation and the usual OCR swaps taken out
+    text = text.lower()
+    for run, replacement in CONFUSABLE_RUNS:
+        text = text.replace(run, replacement)
+    return NOT_WORD.sub('', text).translate(CONFUSABLES)
+
+def stable_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class MinHasher:
+    # MinHash signature of the character n-grams of a text. Two texts agree on each signature value
+    # with probability equal to the Jaccard similarity of their n-gram sets
+    def __init__(self, num_hashes=16, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        # Odd multipliers make each (h * a + b) mod 2**64 a permutation of the 64 bit hashes
+        self.multipliers = rng.integers(1, 2 ** 63, num_hashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.offsets = rng.integers(0, 2 ** 63, num_hashes, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def signature(self, text):
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.array([stable_hash(shingle) for shingle in shingles], dtype=np.uint64)
+        return (hashes[:, None] * self.multipliers + self.offsets).min(axis=0).tolist()
+
+class DedupeIndex:
+    # Maps OCR lines to a canonical id, giving near-duplicate reads of one message the same id.
+    # Exact normalized matches are one dict lookup. New spellings are looked up by locality
+    # sensitive hashing: the MinHash signature is cut into bands and only lines sharing a band
+    # bucket are compared, so the cost does not grow with the index. Candidates must still pass
+    # a character similarity check. Least recently seen lines are evicted once capacity is reached.
+    def __init__(self, capacity=2000, similarity=0.9, min_length=8, bands=8, rows=2, max_candidates=4):
+        self.capacity = max(1, capacity)
+        self.similarity = similarity
+        self.min_length = min_length  # Shorter lines have too few n-grams to compare, they must match exactly
+        self.bands = bands
+        self.rows = rows
+        self.max_candidates = max_candidates  # Lines sharing the most bands are checked first, the rest are skipped
+        self.hasher = MinHasher(bands * rows)
+        self.entries = OrderedDict()  # normalized text -> (id, band keys), in LRU order
+        self.buckets = {}  # band key -> set of normalized texts
+        self.next_id = 0
+        self.hits = 0
+        self.near_hits = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def band_keys(self, normalized):
+        signature = self.hasher.signature(normalized)
+        return [(band,) + tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def find_near(self, normalized, band_keys):
+        shared_bands = Counter()
+        for key in band_keys:
+            shared_bands.update(self.buckets.get(key, ()))
+
+        # Digits OCR does not confuse with letters carry meaning ("10 min" vs "40 min"), they must agree
+        digits = DIGITS.findall(normalized)
+        best, best_ratio = None, self.similarity
+        for candidate, _ in shared_bands.most_common(self.max_candidates):
+            if DIGITS.findall(candidate) != digits:
+                continue
+            matcher = difflib.SequenceMatcher(None, normalized, candidate, autojunk=False)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return best
+
+    def canonical_id(self, text):
+        normalized = normalize_text(text)
+        entry = self.entries.get(normalized)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(normalized)
+            return entry[0]
+
+        band_keys = self.band_keys(normalized) if len(normalized) >= self.min_length else []
+        near = self.find_near(normalized, band_keys) if band_keys else None
+        if near is not None:
+            self.near_hits += 1
+            self.entries.move_to_end(near)
+            line_id = self.entries[near][0]
+        else:
+            line_id = self.next_id
+            self.next_id += 1
+
+        # The misread spelling is indexed too, so the next identical misread is an exact hit
+        self.add(normalized, line_id, band_keys)
+        return line_id
+
+    def add(self, normalized, line_id, band_keys):
+        self.entries[normalized] = (line_id, band_keys)
+        for key in band_keys:
+            self.buckets.setdefault(key, set()).add(normalized)
+        while len(self.entries) > self.capacity:
+            self.evict()
+
+    def evict(self):
+        normalized, (_, band_keys) = self.entries.popitem(last=False)
+        for key in band_keys:
+            bucket = self.buckets[key]
+            bucket.discard(normalized)
+            if not bucket:
+                del self.buckets[key]
+
+    def clear(self):
+        self.entries.clear()
+        self.buckets.clear()
\ No newline at end of file
@@ -0,0 +1,47 @@
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+class FrameRingBuffer:
+    def __init__(self, size=10, dump_folder='./debug_frames'):
+        self.frames = deque(maxlen=max(1, size))
+        self.dump_folder = dump_folder
+        # Frames are added by the capture worker while dumps may be requested from the GUI thread
+        self.lock = threading.Lock()
+
+    def add(self, raw_frame):
+        with self.lock:
+            self.frames.append({'time': datetime.now(), 'raw': raw_frame, 'processed': None})
+
+    def set_processed(self, processed_frame):
+        with self.lock:
+            if self.frames:
+                self.frames[-1]['processed'] = processed_frame
+
+    def resize(self, size):
+        with self.lock:
+            if size != self.frames.maxlen:
+                self.frames = deque(self.frames, maxlen=max(1, size))
+
+    def dump(self, reason="manual"):
+        with self.lock:
+            frames = list(self.frames)
+        if not frames:
+            logging.info("No frames buffered, nothing to dump")
+            return None
+
+        folder = os.path.join(self.dump_folder, f"{datetime.now():%Y%m%d_%H%M%S}_{reason.replace(' ', '_')}")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            for i, frame in enumerate(frames):
+                prefix = os.path.join(folder, f"{i:03d}_{frame['time']:%H%M%S_%f}")
+                frame['raw'].save(f"{prefix}_raw.png")
+                if frame['processed'] is not None:
+                    frame['processed'].save(f"{prefix}_processed.png")
+            logging.info(f"Dumped {len(frames)} buffered frames to {folder} ({reason})")
+            return folder
+        except Exception as e:
+            logging.error(f"Error dumping buffered frames to {folder}: {str(e)}")
+            return None
\ No newline at end of file
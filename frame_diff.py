@@ -0,0 +1,30 @@
+import hashlib
+import logging
+
+class FrameDiffer:
+    # Skips OCR for a frame identical to the last one read. The scroll tracker works out which rows
+    # of a changed frame need OCR, so only a whole-frame digest is kept here
+    def __init__(self):
+        self.last_fingerprint = None
+        self.total_cycles = 0
+        self.skipped_cycles = 0
+
+    def digest(self, image):
+        return hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+
+    def check(self, image, digest=None):
+        # Returns True if the frame changed since the last one. A frame grabbed by the probe comes
+        # with the probe's digest so it is not hashed again
+        self.total_cycles += 1
+        fingerprint = (image.size, digest or self.digest(image))
+        if fingerprint == self.last_fingerprint:
+            self.skipped_cycles += 1
+            return False
+        self.last_fingerprint = fingerprint
+        return True
+
+    def reset(self):
+        self.last_fingerprint = None
+
+    def log_stats(self):
+        logging.info(f"Frame unchanged, OCR skipped ({self.skipped_cycles} of {self.total_cycles} capture cycles skipped)")
\ No newline at end of file
@@ -0,0 +1,53 @@
+import logging
+import re
+from functools import lru_cache
+
+# Date separators the chat shows between messages
+DATE_PATTERNS = [
+    r"\w+,\s+\w+\s+\d{1,2}(st|nd|rd|th)\s+v",  # e.g., "Friday, September 13th v"
+    r"Today\s+v",
+    r"\w+\s+\d{1,2}(st|nd|rd|th),\s+\d{4}"  # e.g., "September 16th, 2024"
+]
+
+# Numbered backreferences and global inline flags change meaning or fail inside a bigger alternation
+UNCOMBINABLE = re.compile(r"\\[1-9]|\(\?[aiLmsux]+\)")
+
+class IgnoreMatcher:
+    # Every ignore pattern and the date patterns compiled into one alternation, so a line is scanned
+    # once instead of once per pattern. Patterns that cannot share an alternation are kept separate.
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        combinable, self.separate = [], []
+        for pattern in self.patterns + tuple(DATE_PATTERNS):
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                logging.warning(f"Invalid ignore pattern '{pattern}' skipped: {str(e)}")
+                continue
+            if UNCOMBINABLE.search(pattern):
+                self.separate.append(compiled)
+            else:
+                combinable.append((pattern, compiled))
+
+        try:
+            self.combined = re.compile('|'.join(f"(?:{pattern})" for pattern, _ in combinable)) if combinable else None
+        except re.error as e:
+            # e.g. the same group name used in two patterns
+            logging.warning(f"Ignore patterns could not be combined, matching them one by one: {str(e)}")
+            self.combined = None
+            self.separate += [compiled for _, compiled in combinable]
+
+    def matches(self, line):
+        if self.combined is not None and self.combined.search(line):
+            return True
+        return any(pattern.search(line) for pattern in self.separate)
+
+@lru_cache(maxsize=16)
+def _build_matcher(patterns):
+    return IgnoreMatcher(patterns)
+
+def get_ignore_matcher(patterns):
+    # Matchers are cached per pattern list, so they are only rebuilt when ignored_lines changes
+    if isinstance(patterns, IgnoreMatcher):
+        return patterns
+    return _build_matcher(tuple(patterns))
\ No newline at end of file
@@ -0,0 +1,294 @@
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_NAME = re.compile(r"^chatlog(\d+)\.csv(\.gz|\.zst)?$")
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+def open_log_text(path):
+    # Text reader for a CSV log whether or not it has been compressed since
+    if not os.path.exists(path):
+        if os.path.exists(path + '.gz'):
+            return gzip.open(path + '.gz', 'rt', newline='', encoding='utf-8')
+        if os.path.exists(path + '.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"{path}.zst needs the zstandard package")
+            raw = open(path + '.zst', 'rb')
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding='utf-8', newline='')
+    return open(path, mode='r', newline='', encoding='utf-8')
+
+class LogManager:
+    # Hands out CSV log names from a counter instead of probing the folder, and tracks each log's
+    # state. logs/manifest.jsonl is append-only, one event per line, so handing out a name costs one
+    # short append however many logs there are; it is rewritten when stale events pile up. Logs that
+    # are closed (a new capture started, or left over from an earlier run) are compressed on a
+    # background thread, and old logs are removed once they pass retention_days or the folder passes
+    # max_total_mb. A log in use that grows past rotate_mb, or was started more than rotate_hours
+    # ago, is replaced by a fresh one at the start of the next capture cycle.
+    def __init__(self, folder='./logs', rotate_mb=50, retention_days=0, max_total_mb=0, compression='gzip', rotate_hours=0):
+        self.folder = folder
+        self.rotate_mb = rotate_mb
+        self.rotate_hours = rotate_hours
+        self.retention_days = retention_days
+        self.max_total_mb = max_total_mb
+        self.compression = compression
+        self.manifest = None
+        self.manifest_lines = 0
+        self.manifest_file = None
+        self.lock = threading.RLock()
+        self.compact_lock = threading.Lock()  # Held while a log is compressed or restored
+        self.compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compaction")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.folder, 'manifest.jsonl')
+
+    def configure(self, rotate_mb, retention_days, max_total_mb, compression, rotate_hours=0):
+        if compression == 'zstd' and zstandard is None:
+            logging.warning("zstandard is not installed, compressing logs with gzip")
+            compression = 'gzip'
+        if compression not in ('gzip', 'zstd', 'none'):
+            logging.warning(f"Unknown log compression '{compression}', using gzip")
+            compression = 'gzip'
+        self.rotate_mb = rotate_mb
+        self.rotate_hours = rotate_hours
+        self.retention_days = retention_days
+        self.max_total_mb = max_total_mb
+        self.compression = compression
+        with self.lock:
+            first_load = self.manifest is None
+            self.load()
+        if first_load:
+            # Nothing is open yet, so logs still marked open were left by an earlier run
+            with self.lock:
+                for name, entry in self.manifest['logs'].items():
+                    if not entry['closed']:
+                        entry['closed'] = entry['created']
+                        self.record({'event': 'closed', 'log': name, 'time': entry['closed']})
+            self.compactor.submit(self.compact)
+
+    def load(self):
+        if self.manifest is not None:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        self.manifest = {'next': 1, 'logs': {}}
+        try:
+            with open(self.manifest_path) as f:
+                for line in f:
+                    try:
+                        self.apply(json.loads(line))
+                    except ValueError:
+                        continue  # Torn last line after a crash
+                    self.manifest_lines += 1
+        except FileNotFoundError:
+            # First run with a manifest: one pass over the folder to pick up existing logs
+            for entry in os.scandir(self.folder):
+                match = LOG_NAME.match(entry.name)
+                if match:
+                    name = entry.name[:len(entry.name) - len(match.group(2) or '')]
+                    modified = entry.stat().st_mtime
+                    self.manifest['logs'][name] = {'created': modified, 'closed': modified, 'file': entry.name}
+                    self.manifest['next'] = max(self.manifest['next'], int(match.group(1)) + 1)
+            logging.info(f"Log manifest created with {len(self.manifest['logs'])} existing logs")
+        self.rewrite()
+
+    def apply(self, event):
+        if event['event'] == 'counter':
+            self.manifest['next'] = max(self.manifest['next'], event['next'])
+            return
+        name = event['log']
+        if event['event'] == 'created':
+            self.manifest['logs'][name] = {'created': event['time'], 'closed': None, 'file': name, 'chat': event.get('chat')}
+            self.manifest['next'] = max(self.manifest['next'], event['number'] + 1)
+        elif event['event'] == 'removed':
+            self.manifest['logs'].pop(name, None)
+        elif name in self.manifest['logs']:
+            entry = self.manifest['logs'][name]
+            if event['event'] == 'closed':
+                entry['closed'] = event['time']
+            elif event['event'] == 'reopened':
+                entry['closed'] = None
+            elif event['event'] == 'file':
+                entry['file'] = event['file']
+
+    def record(self, event):
+        # Called with the lock held
+        self.apply(event)
+        self.manifest_file.write(json.dumps(event) + '\n')
+        self.manifest_file.flush()
+        self.manifest_lines += 1
+        if self.manifest_lines > 2 * len(self.manifest['logs']) + 100:
+            self.rewrite()
+
+    def rewrite(self):
+        # One 'created' event per log plus its current state, swapped in atomically
+        tmp = self.manifest_path + '.tmp'
+        lines = 0
+        with open(tmp, 'w') as f:
+            for name, entry in sorted(self.manifest['logs'].items()):
+                match = LOG_NAME.match(name)
+                events = [{'event': 'created', 'log': name, 'time': entry['created'], 'number': int(match.group(1)) if match else 0}]
+                if entry.get('chat'):
+                    events[0]['chat'] = entry['chat']
+                if entry['closed']:
+                    events.append({'event': 'closed', 'log': name, 'time': entry['closed']})
+                if entry['file'] != name:
+                    events.append({'event': 'file', 'log': name, 'file': entry['file']})
+                for event in events:
+                    f.write(json.dumps(event) + '\n')
+                lines += len(events)
+            # Keeps the counter when the newest logs were removed by retention
+            f.write(json.dumps({'event': 'counter', 'next': self.manifest['next']}) + '\n')
+        if self.manifest_file is not None:
+            self.manifest_file.close()
+        os.replace(tmp, self.manifest_path)
+        self.manifest_file = open(self.manifest_path, 'a')
+        self.manifest_lines = lines + 1
+
+    def allocate(self, chat=None):
+        with self.lock:
+            self.load()
+            number = self.manifest['next']
+            name = f"chatlog{number:04d}.csv"
+            event = {'event': 'created', 'log': name, 'time': time.time(), 'number': number}
+            if chat:
+                event['chat'] = chat
+            self.record(event)
+        return os.path.join(self.folder, name)
+
+    def latest(self, chat):
+        # The newest log of a chat that is still on disk, compressed or not
+        with self.lock:
+            self.load()
+            logs = [(entry['created'], name) for name, entry in self.manifest['logs'].items()
+                    if entry.get('chat') == chat and os.path.exists(os.path.join(self.folder, entry['file']))]
+        return os.path.join(self.folder, max(logs)[1]) if logs else None
+
+    def entry(self, path):
+        # Only logs in the managed folder are tracked, anything else is left alone
+        if os.path.abspath(os.path.dirname(path)) != os.path.abspath(self.folder):
+            return None
+        self.load()
+        return self.manifest['logs'].get(os.path.basename(path))
+
+    def needs_rotation(self, path):
+        if not path or not path.lower().endswith('.csv'):
+            return False
+        try:
+            if self.rotate_mb and os.path.getsize(path) > self.rotate_mb * 1024 * 1024:
+                return True
+        except OSError:
+            return False
+        if self.rotate_hours:
+            with self.lock:
+                entry = self.entry(path)
+            return entry is not None and time.time() - entry['created'] > self.rotate_hours * 3600
+        return False
+
+    def log_closed(self, path):
+        with self.lock:
+            entry = self.entry(path)
+            if entry is None:
+                return
+            self.record({'event': 'closed', 'log': os.path.basename(path), 'time': time.time()})
+        self.compactor.submit(self.compact)
+
+    def restore(self, path):
+        # A reply for a log that was closed and compressed meanwhile: decompress it and mark it open
+        with self.compact_lock, self.lock:
+            entry = self.entry(path)
+            if entry is None:
+                return
+            if not os.path.exists(path) and entry['file'] != os.path.basename(path):
+                with open_log_text(path) as source, open(path, mode='w', newline='', encoding='utf-8') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(os.path.join(self.folder, entry['file']))
+                self.record({'event': 'file', 'log': os.path.basename(path), 'file': os.path.basename(path)})
+                logging.info(f"Restored {path} from its compressed copy")
+            if entry['closed']:
+                self.record({'event': 'reopened', 'log': os.path.basename(path)})
+
+    def compact(self):
+        try:
+            with self.lock:
+                closed = [name for name, entry in self.manifest['logs'].items()
+                          if entry['closed'] and entry['file'] == name and self.compression != 'none']
+            for name in closed:
+                self.compress(name)
+            self.apply_retention()
+        except Exception as e:
+            logging.error(f"Error compacting logs in {self.folder}: {str(e)}")
+
+    def compress(self, name):
+        path = os.path.join(self.folder, name)
+        suffix = '.zst' if self.compression == 'zstd' else '.gz'
+        with self.compact_lock:
+            with self.lock:
+                entry = self.manifest['logs'].get(name)
+                if not entry or not entry['closed'] or entry['file'] != name:
+                    return  # Reopened or already compressed meanwhile
+            if not os.path.exists(path) or os.path.exists(path + '.journal'):
+                return  # A write never finished, it is cut off when the log is next opened
+            tmp = path + suffix + '.tmp'
+            with open(path, 'rb') as source, open(tmp, 'wb') as target:
+                if suffix == '.zst':
+                    zstandard.ZstdCompressor().copy_stream(source, target)
+                else:
+                    with gzip.GzipFile(fileobj=target, mode='wb') as packed:
+                        shutil.copyfileobj(source, packed)
+            os.replace(tmp, path + suffix)
+            os.remove(path)
+            with self.lock:
+                self.record({'event': 'file', 'log': name, 'file': name + suffix})
+        logging.info(f"Compressed {name} to {name + suffix}")
+
+    def apply_retention(self):
+        if not self.retention_days and not self.max_total_mb:
+            return
+        with self.lock:
+            closed = sorted((entry['created'], name, entry['file']) for name, entry in self.manifest['logs'].items() if entry['closed'])
+            total = sum(self.file_size(entry['file']) for entry in self.manifest['logs'].values())
+        cutoff = time.time() - self.retention_days * 86400
+        removed = []
+        for created, name, file_name in closed:
+            too_old = self.retention_days and created < cutoff
+            too_big = self.max_total_mb and total > self.max_total_mb * 1024 * 1024
+            if not too_old and not too_big:
+                continue
+            # The list above may be stale: a late reply can have reopened the log (restore) or the
+            # compressor renamed it since
+            with self.compact_lock, self.lock:
+                entry = self.manifest['logs'].get(name)
+                if not entry or not entry['closed']:
+                    continue
+                file_name = entry['file']
+                size = self.file_size(file_name)
+                try:
+                    os.remove(os.path.join(self.folder, file_name))
+                except FileNotFoundError:
+                    pass
+                self.record({'event': 'removed', 'log': name})
+            total -= size
+            removed.append(name)
+        if removed:
+            logging.info(f"Removed {len(removed)} old logs from {self.folder}")
+
+    def file_size(self, file_name):
+        try:
+            return os.path.getsize(os.path.join(self.folder, file_name))
+        except OSError:
+            return 0
+
+log_manager = LogManager()
\ No newline at end of file
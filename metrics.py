@@ -0,0 +1,125 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+# Pipeline order, used to sort the stats panel and exports. Other stage names are listed after these
+STAGES = ['grab', 'preprocess', 'ocr', 'capture', 'parse', 'align', 'log', 'history', 'ollama', 'typing', 'reply']
+
+class StageStats:
+    # The last window durations of one stage for percentiles, plus totals since start
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        def percentile(pct):
+            return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000 if ordered else 0.0
+        return {
+            'count': self.count,
+            'last_ms': self.samples[-1] * 1000 if self.samples else 0.0,
+            'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'p99_ms': percentile(99),
+            'max_ms': self.max * 1000,
+            'total_s': self.total,
+        }
+
+class StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+NULL_TIMER = nullcontext()
+
+class Metrics:
+    # Stage timings recorded from the GUI thread, the capture worker and the Ollama thread. Disabled,
+    # time() hands back a shared no-op context manager and record() returns straight away
+    def __init__(self, window=500, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def configure(self, enabled, window):
+        with self.lock:
+            self.enabled = enabled
+            if window != self.window:
+                self.window = window
+                for stats in self.stages.values():
+                    stats.samples = deque(stats.samples, maxlen=window)
+
+    def time(self, stage):
+        return StageTimer(self, stage) if self.enabled else NULL_TIMER
+
+    def record(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats(self.window)
+            stats.add(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            summaries = {stage: stats.summary() for stage, stats in self.stages.items()}
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return dict(sorted(summaries.items(), key=lambda item: order.get(item[0], len(STAGES))))
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    def export(self, path):
+        # JSON files hold the latest snapshot, CSV files get one row per stage appended on every export
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        try:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            timestamp = datetime.now().isoformat(timespec='seconds')
+            if path.lower().endswith('.json'):
+                with open(path, 'w') as f:
+                    json.dump({'time': timestamp, 'stages': snapshot}, f, indent=4)
+            else:
+                columns = list(next(iter(snapshot.values())))
+                write_header = not os.path.exists(path)
+                with open(path, mode='a', newline='', encoding='utf-8') as file:
+                    writer = csv.writer(file)
+                    if write_header:
+                        writer.writerow(['time', 'stage'] + columns)
+                    for stage, summary in snapshot.items():
+                        writer.writerow([timestamp, stage] + [round(summary[column], 3) for column in columns])
+            logging.debug(f"Metrics exported to {path}")
+        except Exception as e:
+            logging.error(f"Error exporting metrics to {path}: {str(e)}")
+
+metrics = Metrics()
\ No newline at end of file
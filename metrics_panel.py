@@ -0,0 +1,41 @@
+from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView
+from PyQt5.QtCore import Qt, QTimer
+from metrics import metrics
+
+COLUMNS = [('count', "Count"), ('last_ms', "Last ms"), ('p50_ms', "p50 ms"), ('p95_ms', "p95 ms"),
+           ('p99_ms', "p99 ms"), ('max_ms', "Max ms")]
+
+class MetricsPanel(QGroupBox):
+    # Live per-stage timings, refreshed only while the panel is shown
+    def __init__(self, parent=None, refresh_interval=1000):
+        super().__init__("Pipeline Stats", parent)
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(COLUMNS), self)
+        self.table.setHorizontalHeaderLabels([label for _, label in COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.timer = QTimer(self)
+        self.timer.setInterval(refresh_interval)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        self.setTitle("Pipeline Stats" if metrics.enabled else "Pipeline Stats (disabled, set metrics_enabled in settings.json)")
+        self.table.setRowCount(len(snapshot))
+        self.table.setVerticalHeaderLabels(list(snapshot))
+        for row, summary in enumerate(snapshot.values()):
+            for column, (key, _) in enumerate(COLUMNS):
+                value = summary[key]
+                item = QTableWidgetItem(str(value) if key == 'count' else f"{value:.1f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pytesseract
+from segmentation import segment_blocks
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+DEFAULT_TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe' if os.name == 'nt' else 'tesseract'
+
+class OCREngine:
+    name = "base"
+    workers = 1  # Images the engine can usefully OCR at the same time
+
+    def image_to_string(self, image):
+        raise NotImplementedError
+
+    def version(self):
+        return "unknown"
+
+    def close(self):
+        pass
+
+class PytesseractEngine(OCREngine):
+    # Fallback engine: forks a tesseract process and reloads the model for every image
+    name = "pytesseract"
+
+    def __init__(self, tesseract_cmd=None, config=r'--oem 3 --psm 6'):
+        self.config = config
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd or DEFAULT_TESSERACT_CMD
+        logging.info(f"Tesseract path set to: {pytesseract.pytesseract.tesseract_cmd}")
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, config=self.config)
+
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+class TesserocrEngine(OCREngine):
+    # Keeps a Tesseract API instance with the language model loaded for the life of the engine.
+    # The API is not thread safe, so each thread OCRing through the engine gets its own instance.
+    name = "tesserocr"
+
+    def __init__(self, tesseract_cmd=None, lang='eng'):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.api_kwargs = {'lang': lang, 'psm': tesserocr.PSM.SINGLE_BLOCK, 'oem': tesserocr.OEM.DEFAULT}
+        tessdata_path = os.path.join(os.path.dirname(tesseract_cmd or DEFAULT_TESSERACT_CMD), 'tessdata')
+        if os.path.isdir(tessdata_path):
+            self.api_kwargs['path'] = tessdata_path
+        self.local = threading.local()
+        self.apis = []
+        self.get_api()  # Load the model up front so a bad install fails here and not on the first capture
+
+    def get_api(self):
+        if not hasattr(self.local, 'api'):
+            self.local.api = tesserocr.PyTessBaseAPI(**self.api_kwargs)
+            self.apis.append(self.local.api)
+        return self.local.api
+
+    def image_to_string(self, image):
+        api = self.get_api()
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    def version(self):
+        return tesserocr.tesseract_version().split('\n')[0]
+
+    def close(self):
+        for api in self.apis:
+            api.End()
+
+# Engine owned by each pool worker process, created once by the pool initializer
+_worker_engine = None
+
+def _init_worker_engine(name, tesseract_cmd):
+    global _worker_engine
+    _worker_engine = create_ocr_engine(name, tesseract_cmd)
+
+def _worker_image_to_string(image):
+    return _worker_engine.image_to_string(image)
+
+class ParallelOCREngine(OCREngine):
+    # Splits a frame into bands at the gaps between text lines and OCRs the bands on a process pool
+    def __init__(self, engine, workers, tesseract_cmd=None, min_parallel_height=120):
+        self.engine = engine
+        self.name = f"{engine.name} x{workers}"
+        self.workers = workers
+        self.min_parallel_height = min_parallel_height
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_engine,
+                                        initargs=(engine.name, tesseract_cmd))
+
+    def image_to_string(self, image):
+        if image.height < self.min_parallel_height:
+            return self.engine.image_to_string(image)
+
+        blocks = segment_blocks(image, self.workers)
+        if len(blocks) == 1:
+            return self.engine.image_to_string(image)
+
+        crops = [image.crop((0, top, image.width, bottom)) for top, bottom in blocks]
+        logging.debug(f"OCR of {len(crops)} blocks across {self.workers} workers")
+        # map keeps the submission order, so the text comes back top to bottom
+        return '\n'.join(text.strip('\n') for text in self.pool.map(_worker_image_to_string, crops))
+
+    def version(self):
+        return self.engine.version()
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.engine.close()
+
+OCR_ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+def create_ocr_engine(name="auto", tesseract_cmd=None, workers=1):
+    if name == "auto":
+        name = TesserocrEngine.name if tesserocr is not None else PytesseractEngine.name
+
+    if name not in OCR_ENGINES:
+        logging.warning(f"Unknown OCR engine '{name}', falling back to {PytesseractEngine.name}")
+        name = PytesseractEngine.name
+
+    try:
+        engine = OCR_ENGINES[name](tesseract_cmd=tesseract_cmd)
+    except Exception as e:
+        if name == PytesseractEngine.name:
+            raise
+        logging.error(f"Error starting {name} OCR engine, falling back to {PytesseractEngine.name}: {str(e)}")
+        engine = PytesseractEngine(tesseract_cmd=tesseract_cmd)
+
+    if workers == 0:
+        workers = max(1, (os.cpu_count() or 1) - 1)
+    if workers > 1:
+        engine = ParallelOCREngine(engine, workers, tesseract_cmd)
+
+    logging.info(f"OCR engine: {engine.name}")
+    return engine
\ No newline at end of file
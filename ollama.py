@@ -2,6 +2,7 @@ import requests
 import logging
 import time
 from requests.exceptions import RequestException, Timeout, ConnectionError
+from metrics import metrics
 
 class OllamaAPI:
     def __init__(self, base_url, model):
@@ -22,7 +23,8 @@ class OllamaAPI:
         
         for attempt in range(self.max_retries):
             try:
-                response = requests.post(url, json=data, timeout=self.timeout)
+                with metrics.time('ollama'):
+                    response = requests.post(url, json=data, timeout=self.timeout)
                 response.raise_for_status()
                 json_response = response.json()
                 logging.info(f"Ollama API response received for prompt: {text[:50]}...")
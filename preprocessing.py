@@ -0,0 +1,141 @@
+import logging
+import numpy as np
+from PIL import Image
+
+# Same result as the original convert('L') -> invert -> Contrast(2) chain
+DEFAULT_PIPELINE = ["grayscale", "invert", {"stage": "contrast", "factor": 2}]
+
+def grayscale(arr):
+    if arr.ndim == 2:
+        return arr
+    # ITU-R 601-2 luma in 16.16 fixed point, matching PIL's convert('L')
+    # Widened before multiplying, NumPy 1.x scalar casting keeps uint8 * np.uint32(...) in uint16
+    gray = arr[..., 0].astype(np.uint32) * 19595
+    gray += arr[..., 1].astype(np.uint32) * 38470
+    gray += arr[..., 2].astype(np.uint32) * 7471
+    gray += 0x8000
+    gray >>= 16
+    return gray.astype(np.uint8)
+
+# Point stages only depend on a pixel's own value. Instead of touching the image they map a
+# 256 entry lookup table, using the histogram of the image for stats such as the mean, so a run
+# of point stages costs one histogram and one table lookup over the frame
+
+def invert(lut, histogram):
+    return 255 - lut
+
+def contrast(lut, histogram, factor=2):
+    mean = int(transformed_histogram(lut, histogram).dot(np.arange(256)) / histogram.sum() + 0.5)
+    work = lut.astype(np.float32)
+    work -= mean
+    work *= factor
+    work += mean
+    np.clip(work, 0, 255, out=work)
+    return work.astype(np.uint8)
+
+def binarize(lut, histogram, threshold=None):
+    if threshold is None:
+        threshold = otsu_threshold(transformed_histogram(lut, histogram))
+    return np.where(lut < threshold, 0, 255).astype(np.uint8)
+
+def transformed_histogram(lut, histogram):
+    return np.bincount(lut, weights=histogram, minlength=256)
+
+def otsu_threshold(histogram):
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    total, total_mean = weights[-1], means[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (total_mean * weights - total * means) ** 2 / (weights * (total - weights))
+    return int(np.nanargmax(between)) + 1 if np.isfinite(between).any() else 128
+
+def adaptive_threshold(arr, block_size=15, offset=10):
+    # Pixels darker than their local mean (minus offset) become text (0), the rest background (255).
+    # Local sums come from a summed area table of the edge-padded frame, so each window is four slices
+    radius = block_size // 2
+    block_size = radius * 2 + 1
+    table = np.zeros((arr.shape[0] + block_size, arr.shape[1] + block_size), dtype=np.int64)
+    padded = np.pad(arr, radius, mode='edge')
+    np.cumsum(padded, axis=0, dtype=np.int64, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    sums = table[block_size:, block_size:] - table[:-block_size, block_size:]
+    sums -= table[block_size:, :-block_size]
+    sums += table[:-block_size, :-block_size]
+    is_text = arr.astype(np.int64) * (block_size * block_size) < sums - offset * block_size * block_size
+    arr[...] = 255
+    arr[is_text] = 0
+    return arr
+
+def upscale(arr, factor=2):
+    factor = int(factor)
+    if factor <= 1:
+        return arr
+    return np.repeat(np.repeat(arr, factor, axis=0), factor, axis=1)
+
+def crop_to_content(arr, margin=4, blank_threshold=10):
+    spread = arr.max(axis=1).astype(np.int16) - arr.min(axis=1)
+    rows = np.flatnonzero(spread >= blank_threshold)
+    spread = arr.max(axis=0).astype(np.int16) - arr.min(axis=0)
+    cols = np.flatnonzero(spread >= blank_threshold)
+    if rows.size == 0 or cols.size == 0:
+        return arr
+    return arr[max(rows[0] - margin, 0):rows[-1] + margin + 1, max(cols[0] - margin, 0):cols[-1] + margin + 1]
+
+POINT_STAGES = {
+    'invert': invert,
+    'contrast': contrast,
+    'binarize': binarize,
+}
+
+ARRAY_STAGES = {
+    'grayscale': grayscale,
+    'adaptive_threshold': adaptive_threshold,
+    'upscale': upscale,
+    'crop_to_content': crop_to_content,
+}
+
+class PreprocessingPipeline:
+    def __init__(self, stages=None):
+        self.stages = []
+        for stage in (stages or DEFAULT_PIPELINE):
+            if isinstance(stage, str):
+                stage = {'stage': stage}
+            options = dict(stage)
+            name = options.pop('stage', None)
+            if name not in POINT_STAGES and name not in ARRAY_STAGES:
+                logging.warning(f"Unknown preprocessing stage '{name}' ignored")
+                continue
+            self.stages.append((name, options))
+
+        # Group consecutive point stages so each group is applied as a single lookup
+        self.steps = []
+        for name, options in self.stages:
+            if name in POINT_STAGES:
+                if not self.steps or self.steps[-1][0] != 'lut':
+                    self.steps.append(('lut', []))
+                self.steps[-1][1].append((POINT_STAGES[name], options))
+            else:
+                self.steps.append(('array', (ARRAY_STAGES[name], options)))
+
+    def __call__(self, image):
+        # Every stage works on one writable channel. PIL's C conversion uses the same luma weights as
+        # the grayscale stage and is the cheapest way to get there from a screenshot
+        if isinstance(image, Image.Image):
+            arr = np.array(image if image.mode == 'L' else image.convert('L'))
+        else:
+            arr = grayscale(image) if image.ndim == 3 else np.array(image)
+
+        for kind, step in self.steps:
+            if kind == 'lut':
+                histogram = np.bincount(arr.ravel(), minlength=256).astype(np.float64)
+                lut = np.arange(256, dtype=np.uint8)
+                for stage, options in step:
+                    lut = stage(lut, histogram, **options)
+                np.take(lut, arr, out=arr, mode='clip')
+            else:
+                stage, options = step
+                arr = stage(arr, **options)
+        return Image.fromarray(np.ascontiguousarray(arr))
+
+    def describe(self):
+        return " -> ".join(name + (f"{options}" if options else "") for name, options in self.stages)
\ No newline at end of file
@@ -0,0 +1,136 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+# Allocations are grouped by the line that made them, deeper tracebacks only make snapshots slower
+TRACEBACK_FRAMES = 1
+IGNORED_ALLOCATORS = {tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>"}
+
+class CycleProfile:
+    # cProfile only sees the thread that enables it, so a cycle is profiled on the thread it runs on.
+    # tracemalloc is process wide and may also count allocations other threads made meanwhile
+    def __init__(self, profiler, kind, number):
+        self.profiler = profiler
+        self.kind = kind
+        self.number = number
+        self.profile = None
+
+    def __enter__(self):
+        self.before = tracemalloc.take_snapshot()
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one active profiler per process, e.g. when a capture and a reply overlap
+            logging.warning(f"Not profiling {self.kind} cycle {self.number}: {str(e)}")
+            self.profile = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+        self.profiler.save_cycle(self.kind, self.number, self.profile, self.before, tracemalloc.take_snapshot())
+        return False
+
+class Profiler:
+    # Profiles the first `cycles` capture cycles and reply generations. For each cycle it writes
+    # <kind>_<n>.prof (open with pstats or snakeviz), <kind>_<n>.snapshot (tracemalloc) and a readable
+    # <kind>_<n>.txt, and rewrites summary.txt with the top cumulative functions and allocators so far
+    def __init__(self):
+        self.cycles = 0
+        self.folder = None
+        self.top = 25
+        self.counts = {}
+        self.allocations = {}  # kind -> {"file:line": bytes allocated and still held after the cycle}
+        self.lock = threading.Lock()
+        self.writer = None  # Comparing snapshots takes seconds in a large process, it is kept off the profiled threads
+
+    @property
+    def enabled(self):
+        return self.cycles > 0
+
+    def configure(self, cycles, folder='./profiles', top=25):
+        self.cycles = cycles
+        self.top = top
+        if not cycles:
+            return
+        self.folder = os.path.join(folder, f"{datetime.now():%Y%m%d_%H%M%S}")
+        os.makedirs(self.folder, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+        logging.info(f"Profiling the first {cycles} capture cycles and replies into {self.folder}")
+
+    def profile(self, kind):
+        if not self.cycles:
+            return nullcontext()
+        with self.lock:
+            number = self.counts.get(kind, 0) + 1
+            if number > self.cycles:
+                return nullcontext()
+            self.counts[kind] = number
+        return CycleProfile(self, kind, number)
+
+    def save_cycle(self, kind, number, profile, before, after):
+        self.writer.submit(self.write_cycle, kind, number, profile, before, after)
+
+    def write_cycle(self, kind, number, profile, before, after):
+        prefix = os.path.join(self.folder, f"{kind}_{number:03d}")
+        try:
+            allocations = [stat for stat in after.compare_to(before, 'lineno')
+                           if stat.size_diff > 0 and stat.traceback[0].filename not in IGNORED_ALLOCATORS]
+            with self.lock:
+                totals = self.allocations.setdefault(kind, {})
+                for stat in allocations:
+                    frame = stat.traceback[0]
+                    key = f"{frame.filename}:{frame.lineno}"
+                    totals[key] = totals.get(key, 0) + stat.size_diff
+
+            report = [f"{kind} cycle {number}"]
+            if profile is not None:
+                profile.dump_stats(f"{prefix}.prof")
+                report.append(format_stats(pstats.Stats(profile), self.top))
+            after.dump(f"{prefix}.snapshot")
+            report.append(f"Top {self.top} allocators (bytes still held after the cycle)")
+            report += [f"{stat.size_diff / 1024:10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback[0]}"
+                       for stat in allocations[:self.top]]
+            with open(f"{prefix}.txt", 'w', encoding='utf-8') as f:
+                f.write('\n'.join(report) + '\n')
+            self.write_summary()
+            logging.info(f"Profile of {kind} cycle {number} written to {prefix}.txt")
+        except Exception as e:
+            logging.error(f"Error saving profile of {kind} cycle {number}: {str(e)}")
+
+    def write_summary(self):
+        with self.lock:
+            counts = dict(self.counts)
+            allocations = {kind: dict(totals) for kind, totals in self.allocations.items()}
+
+        report = []
+        for kind, count in counts.items():
+            profiles = [path for path in (os.path.join(self.folder, f"{kind}_{number:03d}.prof") for number in range(1, count + 1))
+                        if os.path.exists(path)]
+            report.append(f"=== {kind}: {len(profiles)} of {count} cycles profiled ===")
+            if profiles:
+                report.append(format_stats(pstats.Stats(*profiles), self.top))
+            report.append(f"Top {self.top} allocators over all {kind} cycles")
+            biggest = sorted(allocations.get(kind, {}).items(), key=lambda item: item[1], reverse=True)[:self.top]
+            report += [f"{size / 1024:10.1f} KiB  {location}" for location, size in biggest]
+            report.append("")
+        with open(os.path.join(self.folder, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(report))
+
+def format_stats(stats, top):
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.strip_dirs().sort_stats('cumulative').print_stats(top)
+    return stream.getvalue()
+
+profiler = Profiler()
\ No newline at end of file
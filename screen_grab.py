@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from PIL import Image, ImageGrab
+from metrics import metrics
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+class ScreenGrabber:
+    name = "base"
+
+    def __init__(self, log_every=20):
+        self.log_every = log_every
+        self.grab_count = 0
+        self.window_time = 0.0
+        self.window_count = 0
+
+    def grab(self, bbox):
+        start = time.perf_counter()
+        image = self._grab(bbox)
+        elapsed = time.perf_counter() - start
+        metrics.record('grab', elapsed)
+
+        self.grab_count += 1
+        self.window_time += elapsed
+        self.window_count += 1
+        logging.debug(f"{self.name} grab took {elapsed * 1000:.1f} ms")
+        if self.window_count >= self.log_every:
+            logging.info(f"{self.name} grab latency: {self.window_time / self.window_count * 1000:.1f} ms average over {self.window_count} grabs")
+            self.window_time, self.window_count = 0.0, 0
+        return image
+
+    def _grab(self, bbox):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class PILGrabber(ScreenGrabber):
+    name = "pil"
+
+    def _grab(self, bbox):
+        return ImageGrab.grab(bbox=bbox)
+
+class MSSGrabber(ScreenGrabber):
+    # Grabs only the requested rectangle (X shared memory on Linux, BitBlt on Windows)
+    name = "mss"
+
+    def __init__(self, **kwargs):
+        if mss is None:
+            raise RuntimeError("mss is not installed")
+        super().__init__(**kwargs)
+        # mss handles are not safe to share between threads, keep one per grabbing thread
+        self.local = threading.local()
+        self.handles = []
+
+    def _grab(self, bbox):
+        if not hasattr(self.local, 'sct'):
+            self.local.sct = mss.mss()
+            self.handles.append(self.local.sct)
+        left, top, right, bottom = bbox
+        shot = self.local.sct.grab({'left': left, 'top': top, 'width': right - left, 'height': bottom - top})
+        return Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
+
+    def close(self):
+        for sct in self.handles:
+            sct.close()
+
+class ReplayGrabber(ScreenGrabber):
+    # Serves recorded frames from a folder of images or a multi-frame file (GIF/TIFF) instead of
+    # the screen, so the capture pipeline can run headless. The requested rectangle is ignored.
+    name = "replay"
+
+    def __init__(self, source, loop=False, **kwargs):
+        super().__init__(**kwargs)
+        self.source = source
+        self.loop = loop
+        self.position = 0
+        self.last_frame = None
+        self.lock = threading.Lock()  # Several capture regions may replay from the same source
+        if os.path.isdir(source):
+            self.frame_files = sorted(os.path.join(source, name) for name in os.listdir(source)
+                                      if name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')))
+            self.frame_count = len(self.frame_files)
+            self.sequence = None
+        else:
+            self.frame_files = None
+            self.sequence = Image.open(source)
+            self.frame_count = getattr(self.sequence, 'n_frames', 1)
+        if not self.frame_count:
+            raise ValueError(f"No frames found in {source}")
+        logging.info(f"Replaying {self.frame_count} frames from {source}")
+
+    def _grab(self, bbox):
+        with self.lock:
+            if self.position >= self.frame_count:
+                if not self.loop:
+                    # Past the end the chat stays idle on its last frame
+                    return self.last_frame.copy()
+                self.position = 0
+
+            if self.frame_files is not None:
+                with Image.open(self.frame_files[self.position]) as frame:
+                    self.last_frame = frame.convert('RGB')
+            else:
+                self.sequence.seek(self.position)
+                self.last_frame = self.sequence.convert('RGB')
+            self.position += 1
+            return self.last_frame.copy()
+
+    def close(self):
+        if self.sequence is not None:
+            self.sequence.close()
+
+def create_screen_grabber(name="auto", replay_source=None):
+    if name == "auto":
+        name = MSSGrabber.name if mss is not None else PILGrabber.name
+
+    try:
+        if name == ReplayGrabber.name:
+            grabber = ReplayGrabber(replay_source)
+        elif name == MSSGrabber.name:
+            grabber = MSSGrabber()
+        else:
+            if name != PILGrabber.name:
+                logging.warning(f"Unknown capture backend '{name}', falling back to {PILGrabber.name}")
+            grabber = PILGrabber()
+    except Exception as e:
+        logging.error(f"Error starting {name} capture backend, falling back to {PILGrabber.name}: {str(e)}")
+        grabber = PILGrabber()
+
+    logging.info(f"Capture backend: {grabber.name}")
+    return grabber
\ No newline at end of file
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import numpy as np
+from segmentation import find_blank_rows, find_text_lines
+
+class ScrollTracker:
+    def __init__(self, min_overlap=0.25, blank_threshold=10, max_candidates=16):
+        self.min_overlap = min_overlap  # Fraction of the frame that must line up to trust a scroll estimate
+        self.blank_threshold = blank_threshold  # Max pixel spread for a row to count as a gap between text lines
+        self.max_candidates = max_candidates
+        self.last_size = None
+        self.last_row_hashes = None
+        self.last_blank_rows = None
+        self.reread_lines = 0  # Text lines at the top of the last band that were already read
+
+    def row_fingerprints(self, image):
+        height = image.height
+        data = image.tobytes()
+        stride = len(data) // height if height else 0
+        hashes = [hashlib.blake2b(data[r * stride:(r + 1) * stride], digest_size=8).digest() for r in range(height)]
+        return hashes, find_blank_rows(image, self.blank_threshold).tolist()
+
+    def find_new_rows(self, image):
+        # Returns the first row of the frame that still needs OCR: 0 for the whole frame,
+        # image.height when nothing new appeared
+        hashes, blank_rows = self.row_fingerprints(image)
+        self.reread_lines = 0
+        previous = self.last_row_hashes if self.last_size == image.size else None
+        previous_blank_rows = self.last_blank_rows
+        self.last_size = image.size
+        self.last_row_hashes = hashes
+        self.last_blank_rows = blank_rows
+
+        if previous is None:
+            return 0
+
+        height = len(hashes)
+        offset, matched = self.estimate_offset(previous, hashes, blank_rows)
+        if matched >= height:
+            logging.debug("Preprocessed frame unchanged, no rows to OCR")
+            return height
+        if matched < height * self.min_overlap:
+            logging.debug(f"No reliable scroll alignment (best offset {offset}, {matched} rows matched), OCR full frame")
+            return 0
+        # The band is only stitched on when it starts below everything read so far. A change to text
+        # already read (an "(edited)" marker, a reaction, a typing indicator going away) would make
+        # the band repeat lines from the middle of the transcript
+        if not all(previous_blank_rows[matched + offset:]):
+            logging.debug(f"Rows changed above the end of the last frame's text (offset {offset}, row {matched}), OCR full frame")
+            return 0
+
+        # Back up to the gap above the first changed row so a text line is never cut in half
+        first_new_row = matched
+        while first_new_row > 0 and not blank_rows[first_new_row - 1]:
+            first_new_row -= 1
+        # Rows above the first change are unchanged, so the lines they hold were read last time
+        self.reread_lines = len(find_text_lines(np.array(blank_rows[first_new_row:matched])))
+        logging.debug(f"Chat scrolled {offset} rows, OCR limited to rows {first_new_row}-{height}")
+        return first_new_row
+
+    def estimate_offset(self, previous, current, blank_rows):
+        # A scroll of d rows means current[r] == previous[r + d]; find the d that lines up the
+        # longest run from the top of the frame, using non-blank rows as anchors
+        row_index = {}
+        for j, row_hash in enumerate(previous):
+            row_index.setdefault(row_hash, []).append(j)
+
+        candidates = {0}
+        for i, row_hash in enumerate(current):
+            if len(candidates) >= self.max_candidates:
+                break
+            if blank_rows[i]:
+                continue
+            for j in row_index.get(row_hash, ()):
+                if j >= i:
+                    candidates.add(j - i)
+
+        best_offset, best_matched = 0, 0
+        for offset in sorted(candidates):
+            matched = 0
+            limit = len(current) - offset
+            while matched < limit and current[matched] == previous[matched + offset]:
+                matched += 1
+            if offset == 0 and matched == len(current):
+                return 0, matched
+            if matched > best_matched:
+                best_offset, best_matched = offset, matched
+        return best_offset, best_matched
+
+    def reset(self):
+        self.last_size = None
+        self.last_row_hashes = None
+        self.last_blank_rows = None
\ No newline at end of file
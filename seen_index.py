@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dedupe_index import normalize_text
+
+def message_fingerprint(entry, predecessor=None):
+    # Stable across runs, unlike hash(). With a predecessor the fingerprint is of the pair, so a
+    # repeated "lol" after a different message is a different fingerprint
+    parts = [normalize_text(f"{username}: {message}") for username, message in ([predecessor, entry] if predecessor else [entry])]
+    return hashlib.blake2b('\n'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+def index_path(folder, conversation):
+    slug = re.sub(r"[^\w-]+", "_", conversation).strip("_").lower() or "chat"
+    return os.path.join(folder, f"seen_{slug}.idx")
+
+class SeenMessageIndex:
+    # Fingerprints of every message already logged for one conversation, kept in memory for O(1)
+    # lookups and in an append-only file ("<unix time> <fingerprint>" per line) so a restart or
+    # crash resumes without logging or answering the visible chat again. A message seen again gets a
+    # new line with the new time. Entries older than max_age_days or beyond max_entries are dropped,
+    # also during a run, and the file is rewritten when it grows to twice the live entries.
+    def __init__(self, path, max_entries=20000, max_age_days=30):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.max_age = max_age_days * 86400
+        self.entries = OrderedDict()  # fingerprint -> time added, oldest first
+        self.file_lines = 0
+        self.file = None
+        self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.entries
+
+    def load(self):
+        cutoff = time.time() - self.max_age
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self.file_lines += 1
+                    try:
+                        added, fingerprint = line.split()
+                        added = float(added)
+                    except ValueError:
+                        continue  # Torn last line from a crash
+                    if added >= cutoff:
+                        self.entries.pop(fingerprint, None)
+                        self.entries[fingerprint] = added
+        except FileNotFoundError:
+            pass
+        self.trim()
+        if self.file_lines > len(self.entries):
+            self.compact()
+        logging.info(f"Seen message index {self.path}: {len(self.entries)} messages")
+
+    def trim(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def expire(self, now=None):
+        # Entries are kept in the order they were last seen, so the expired ones are at the front
+        cutoff = (now or time.time()) - self.max_age
+        while self.entries and next(iter(self.entries.values())) < cutoff:
+            self.entries.popitem(last=False)
+
+    def compact(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{added:.0f} {fingerprint}\n" for fingerprint, added in self.entries.items())
+        os.replace(temp_path, self.path)
+        self.file_lines = len(self.entries)
+
+    def add_all(self, fingerprints):
+        now = time.time()
+        self.expire(now)
+        added = list(dict.fromkeys(fingerprints))
+        for fingerprint in added:
+            # Still on screen counts as seen again, it ages from now
+            self.entries.pop(fingerprint, None)
+            self.entries[fingerprint] = now
+        self.trim()
+        if not added:
+            return
+
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.writelines(f"{now:.0f} {fingerprint}\n" for fingerprint in added)
+        self.file.flush()
+        self.file_lines += len(added)
+        if self.file_lines > 2 * self.max_entries:
+            self.compact()
+
+    def filter_new(self, entries, predecessor=None):
+        # Returns the entries not seen before and records them. Without a known predecessor the
+        # first entry can only be checked on its own content, so both kinds are stored
+        self.expire()
+        new_entries, fingerprints = [], []
+        for entry in entries:
+            pair = message_fingerprint(entry, predecessor)
+            content = message_fingerprint(entry)
+            seen = pair in self.entries if predecessor else content in self.entries
+            if not seen:
+                new_entries.append(entry)
+            fingerprints += [pair, content] if predecessor else [content]
+            predecessor = entry
+        self.add_all(fingerprints)
+        return new_entries
+
+    def record(self, entries, predecessor=None):
+        # Same fingerprints as filter_new, for entries already known to be new
+        fingerprints = []
+        for entry in entries:
+            fingerprints += [message_fingerprint(entry, predecessor), message_fingerprint(entry)] if predecessor else [message_fingerprint(entry)]
+            predecessor = entry
+        self.add_all(fingerprints)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
\ No newline at end of file
@@ -0,0 +1,36 @@
+import numpy as np
+
+def find_blank_rows(image, blank_threshold=10):
+    # A row is blank when its pixel values barely vary, i.e. a gap between text lines
+    arr = np.asarray(image if image.mode == 'L' else image.convert('L'))
+    if arr.size == 0:
+        return np.ones(arr.shape[0], dtype=bool)
+    return (arr.max(axis=1).astype(np.int16) - arr.min(axis=1)) < blank_threshold
+
+def find_text_lines(blank_rows):
+    # Returns (top, bottom) row ranges of consecutive non-blank rows
+    edges = np.diff(np.concatenate(([1], blank_rows.astype(np.int8), [1])))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def segment_blocks(image, max_blocks, blank_threshold=10, padding=3):
+    # Split a frame into at most max_blocks horizontal bands of similar height, cutting only in
+    # the blank gaps between text lines so no line is split across two bands
+    lines = find_text_lines(find_blank_rows(image, blank_threshold))
+    if len(lines) <= 1 or max_blocks <= 1:
+        return [(0, image.height)]
+
+    text_height = sum(bottom - top for top, bottom in lines)
+    target_height = text_height / min(max_blocks, len(lines))
+    blocks = []
+    block_top, block_height = lines[0][0], 0
+    for i, (top, bottom) in enumerate(lines):
+        block_height += bottom - top
+        is_last = i == len(lines) - 1
+        if is_last or (block_height >= target_height and len(blocks) < max_blocks - 1):
+            blocks.append((block_top, bottom))
+            if not is_last:
+                block_top, block_height = lines[i + 1][0], 0
+
+    return [(max(top - padding, 0), min(bottom + padding, image.height)) for top, bottom in blocks]
\ No newline at end of file
@@ -1,7 +1,7 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QLineEdit, QPushButton, 
                              QLabel, QSpinBox, QTextEdit, QMessageBox, QHBoxLayout)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from utils import load_settings, save_settings
+from settings_service import settings_service
 from ollama import OllamaAPI
 
 class TestOllamaThread(QThread):
@@ -47,7 +47,7 @@ class SettingsDialog(QDialog):
 
         self.capture_interval_input = QSpinBox(self)
         self.capture_interval_input.setRange(1, 3600)
-        form_layout.addRow("Capture Interval (seconds):", self.capture_interval_input)
+        form_layout.addRow("Max Capture Interval (seconds):", self.capture_interval_input)
 
         self.my_username_input = QLineEdit(self)
         form_layout.addRow("My Username:", self.my_username_input)
@@ -70,7 +70,7 @@ class SettingsDialog(QDialog):
         layout.addWidget(save_button)
 
     def load_current_settings(self):
-        settings = load_settings()
+        settings = settings_service.get()
         self.ollama_url_input.setText(settings['ollama_url'])
         self.model_input.setText(settings['model'])
         self.capture_interval_input.setValue(settings['capture_interval'])
@@ -89,7 +89,7 @@ class SettingsDialog(QDialog):
             'prompt': self.prompt_input.toPlainText(),
             'ignored_lines': [line.strip() for line in self.ignored_lines_input.toPlainText().split('\n') if line.strip()]
         }
-        save_settings(new_settings)
+        settings_service.save(new_settings)
         self.accept()
 
     def test_ollama(self):
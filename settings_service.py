@@ -0,0 +1,69 @@
+import logging
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from utils import load_settings, save_settings
+
+class SettingsService(QObject):
+    # settings.json is read once and kept in memory. The file is watched so edits made outside the
+    # app are picked up too, and settings_changed only fires when a value actually changed, with
+    # the set of keys that did
+    settings_changed = pyqtSignal(dict, set)
+
+    def __init__(self, path='settings.json'):
+        super().__init__()
+        self.path = path
+        self.settings = None
+        self.watcher = None
+        self.reload_timer = None
+
+    def start(self):
+        # Called once the QApplication exists
+        if self.watcher is not None:
+            return
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.schedule_reload)
+        # Editors often write a file in several steps, wait for them to finish
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(300)
+        self.reload_timer.timeout.connect(self.reload)
+        self.reload()
+
+    def get(self):
+        if self.settings is None:
+            self.reload()
+        return self.settings
+
+    def schedule_reload(self, path=None):
+        self.reload_timer.start()
+
+    def reload(self):
+        try:
+            settings = load_settings()
+        except Exception as e:
+            if self.settings is None:
+                raise
+            logging.error(f"Error reading {self.path}, keeping the current settings: {str(e)}")
+            settings = None
+        self.watch()
+        if settings is None:
+            return self.settings
+
+        previous, self.settings = self.settings, settings
+        if previous is not None:
+            changed = {key for key in settings if settings[key] != previous.get(key)}
+            if changed:
+                logging.info(f"Settings changed: {', '.join(sorted(changed))}")
+                self.settings_changed.emit(settings, changed)
+        return settings
+
+    def watch(self):
+        # A file replaced on save (rename over the old one) drops out of the watcher
+        if self.watcher is not None and self.path not in self.watcher.files() and os.path.exists(self.path):
+            self.watcher.addPath(self.path)
+
+    def save(self, settings):
+        save_settings(settings)
+        return self.reload()
+
+settings_service = SettingsService()
\ No newline at end of file
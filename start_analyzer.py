@@ -1,107 +1,180 @@
 import logging
-from PyQt5.QtCore import QObject, QTimer, pyqtSignal
-from utils import create_new_log_file, append_to_csv, get_last_messages
+import time
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from capture import CaptureWorker
+from utils import create_new_log_file, resume_log_file, append_batch_to_csv, get_conversation_context
+from metrics import metrics
+from log_manager import log_manager
 
 class StartAnalyzer(QObject):
     analysis_complete = pyqtSignal(list, bool)
     ollama_response_ready = pyqtSignal(str, str)
     capture_complete = pyqtSignal(bool)
-
-    def __init__(self, analyzer_window, capture_handler, ai_handler, chat_position_handler, capture_interval):
+    # Queued requests to the capture worker, they run on its thread. A region index of None means all regions
+    start_capture_requested = pyqtSignal(object)
+    resume_capture_requested = pyqtSignal(object)
+    stop_capture_requested = pyqtSignal(object)
+    initial_capture_requested = pyqtSignal()
+    intervals_changed = pyqtSignal(float, float)
+
+    def __init__(self, regions, ai_handler, capture_interval, probe_min_interval=1, capture_workers=1,
+                 history_token_budget=1500, history_max_messages=100):
         super().__init__()
-        self.analyzer_window = analyzer_window
-        self.capture_handler = capture_handler
+        self.regions = regions
         self.ai_handler = ai_handler
-        self.chat_position_handler = chat_position_handler
-        self.capture_interval = capture_interval
+        self.capture_interval = capture_interval  # Longest wait between probes while a chat is idle
+        self.probe_min_interval = probe_min_interval
+        self.set_history_limits(history_token_budget, history_max_messages)
         self.is_analyzing = False
-        self.waiting_for_ollama = False
-        self.capture_timer = QTimer(self)
-        self.capture_timer.timeout.connect(self.perform_capture)
-        self.log_file = None
+        self.pending_initial_captures = set()
+        self.initial_capture_failed = False
+
+        self.capture_worker = CaptureWorker(self.regions, probe_min_interval, capture_interval, capture_workers)
+        self.capture_scheduler = self.capture_worker.capture_scheduler
+        self.capture_thread = QThread(self)
+        self.capture_worker.moveToThread(self.capture_thread)
+        self.start_capture_requested.connect(self.capture_worker.start_scheduler)
+        self.resume_capture_requested.connect(self.capture_worker.resume_scheduler)
+        self.stop_capture_requested.connect(self.capture_worker.stop_scheduler)
+        self.initial_capture_requested.connect(self.capture_worker.initial_capture)
+        self.intervals_changed.connect(self.capture_worker.set_scheduler_intervals)
+        self.capture_worker.new_text_ready.connect(self.handle_new_text)
+        self.capture_worker.initial_capture_ready.connect(self.on_initial_capture)
+        self.capture_thread.start()
+
         self.ai_handler.ai_response_complete.connect(self.restart_capture)
 
-    def capture_restart(self):
-        try:
-            self.stop_analysis()
-            self.log_file = create_new_log_file()
-            logging.info(f"New CSV file created: {self.log_file}")
-            self.capture_handler.set_log_file(self.log_file)
+    def set_history_limits(self, token_budget, max_messages):
+        # How much of the conversation goes into each Ollama prompt
+        self.history_token_budget = token_budget
+        self.history_max_messages = max_messages
 
-            captured_text = self.analyzer_window.capture_screen()
-            processed_lines = self.capture_handler.process_captured_text(captured_text)
+    def set_capture_intervals(self, probe_min_interval, capture_interval):
+        if (probe_min_interval, capture_interval) == (self.probe_min_interval, self.capture_interval):
+            return
+        self.probe_min_interval = probe_min_interval
+        self.capture_interval = capture_interval
+        self.intervals_changed.emit(float(probe_min_interval), float(capture_interval))
+        logging.info(f"Capture interval set to {probe_min_interval:g}-{capture_interval:g} seconds")
 
-            for username, message in processed_lines:
-                append_to_csv(self.log_file, "captured_conversation", username, message)
+    @property
+    def log_file(self):
+        return self.regions[0].log_file
 
-            logging.info("Initial capture completed and added to CSV")
-            self.capture_complete.emit(True)
+    def capture_restart(self):
+        if self.pending_initial_captures:
+            logging.info("Initial capture already running")
             return self.log_file
+        try:
+            self.stop_analysis()
+            for region in self.regions:
+                region.set_log_file(resume_log_file(region.name))
+                region.waiting_for_ollama = False
         except Exception as e:
             logging.error(f"Error during capture/restart: {str(e)}")
             self.capture_complete.emit(False)
             return None
 
+        # Capture areas are read here, the grabs and OCR run on the worker and report back to on_initial_capture
+        for region in self.regions:
+            region.analyzer_window.update_capture_bbox()
+        self.pending_initial_captures = set(range(len(self.regions)))
+        self.initial_capture_failed = False
+        self.initial_capture_requested.emit()
+        return self.log_file
+
+    def on_initial_capture(self, index, processed_lines, success):
+        region = self.regions[index]
+        self.pending_initial_captures.discard(index)
+        try:
+            if success:
+                with metrics.time('log'):
+                    append_batch_to_csv(region.log_file, "captured_conversation", processed_lines)
+                logging.info(f"Initial capture of {region.name} completed and added to CSV")
+            else:
+                self.initial_capture_failed = True
+        except Exception as e:
+            logging.error(f"Error during capture/restart: {str(e)}")
+            self.initial_capture_failed = True
+
+        if not self.pending_initial_captures:
+            self.capture_complete.emit(not self.initial_capture_failed)
+
     def start_analysis(self):
+        if self.pending_initial_captures:
+            raise ValueError("Capture is still running. Please wait for it to finish.")
         if not self.log_file:
             raise ValueError("No capture performed. Please use Capture first.")
 
         self.is_analyzing = True
-        logging.info(f"System: Analysis started. Will start a scan in {self.capture_interval} seconds for new Text")
-        self.capture_timer.start(self.capture_interval * 1000)
+        logging.info(f"System: Analysis started on {len(self.regions)} chat region(s). Checking for new Text every {self.capture_scheduler.min_interval:g}-{self.capture_scheduler.max_interval:g} seconds")
+        for region in self.regions:
+            region.analyzer_window.update_capture_bbox()
+        self.start_capture_requested.emit(None)
 
     def stop_analysis(self):
         self.is_analyzing = False
-        self.capture_timer.stop()
+        self.stop_capture_requested.emit(None)
         logging.info("System: Analysis stopped")
 
-    def perform_capture(self):
-        if not self.is_analyzing or self.waiting_for_ollama:
-            return
+    def shutdown(self):
+        self.stop_capture_requested.emit(None)
+        self.capture_thread.quit()
+        self.capture_thread.wait()
+        self.capture_worker.close()
+
+    def handle_new_text(self, index, new_text):
+        region = self.regions[index]
+        capture_handler = region.capture_handler
+        logging.info(f"New Text is found in {region.name} updating database. ##TEXT that was added## {new_text}")
+        # Rotated before the cycle's messages are written, never between a message and its reply,
+        # so the reply sees the history and is logged next to the message it answers
+        if log_manager.needs_rotation(region.log_file):
+            region.set_log_file(create_new_log_file(region.name))
+        with metrics.time('log'):
+            append_batch_to_csv(region.log_file, "captured_conversation", new_text)
 
-        logging.info(f"Screen Captured, {self.capture_interval} sec before next screen refresh")
-        captured_text = self.analyzer_window.capture_screen()
-        processed_lines = self.capture_handler.process_captured_text(captured_text)
-        new_text = self.capture_handler.get_new_text(processed_lines)
-        
-        if new_text:
-            self.handle_new_text(new_text)
-        else:
-            logging.info(f"No new text found waiting {self.capture_interval} sec to retry")
-
-    def handle_new_text(self, new_text):
-        logging.info(f"New Text is found updating database. ##TEXT that was added## {new_text}")
         other_user_messages = []
         last_username = None
         for username, message in new_text:
-            append_to_csv(self.log_file, "captured_conversation", username, message)
             last_username = username
-            
-            if username in self.capture_handler.other_usernames:
+            if username in capture_handler.other_usernames:
                 other_user_messages.append((username, message))
-            elif username == self.capture_handler.my_username:
+            elif username == capture_handler.my_username:
                 logging.info("User text added, no Ollama reply needed.")
 
-        if other_user_messages and last_username in self.capture_handler.other_usernames:
-            self.process_other_user_messages(other_user_messages)
+        if not self.is_analyzing:
+            logging.info("Analysis stopped while capturing, no response sent")
+        elif other_user_messages and last_username in capture_handler.other_usernames:
+            self.process_other_user_messages(index, other_user_messages)
         else:
             logging.info("No response needed: last message is from my username or no new messages from other users")
+            # The worker paused this region after posting its text
+            self.resume_capture_requested.emit(index)
 
-        self.analysis_complete.emit(new_text, self.waiting_for_ollama)
+        self.analysis_complete.emit(new_text, region.waiting_for_ollama)
 
-    def process_other_user_messages(self, messages):
-        self.waiting_for_ollama = True
-        logging.info("Contacting Ollama, not checking for new text until reply is entered.")
-        self.capture_timer.stop()
+    def process_other_user_messages(self, index, messages):
+        region = self.regions[index]
+        region.waiting_for_ollama = True
+        region.reply_started = time.perf_counter()
+        logging.info(f"Contacting Ollama, not checking {region.name} for new text until reply is entered.")
+        self.stop_capture_requested.emit(index)
         
         combined_message = "\n".join([f"{username}: {message}" for username, message in messages])
-        conversation_history = get_last_messages(self.log_file, -1)
+        with metrics.time('history'):
+            conversation_history = get_conversation_context(region.log_file, self.history_token_budget, self.history_max_messages)
         
         self.ai_handler.process_new_message(messages[-1][0], combined_message, 
-                                            self.chat_position_handler.get_chat_position(), 
-                                            conversation_history)
-
-    def restart_capture(self):
-        self.waiting_for_ollama = False
+                                            region.chat_position_handler.get_chat_position(), 
+                                            conversation_history, region.log_file, index)
+
+    def restart_capture(self, index):
+        region = self.regions[index]
+        region.waiting_for_ollama = False
+        # Whole reply: history, Ollama, typing and logging, until this chat is watched again
+        if region.reply_started is not None:
+            metrics.record('reply', time.perf_counter() - region.reply_started)
+            region.reply_started = None
         if self.is_analyzing:
-            self.capture_timer.start(self.capture_interval * 1000)
\ No newline at end of file
+            self.start_capture_requested.emit(index)
\ No newline at end of file
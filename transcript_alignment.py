@@ -0,0 +1,56 @@
+from dedupe_index import DedupeIndex
+
+def prefix_function(keys):
+    # KMP failure table: longest proper prefix of keys[:i + 1] that is also its suffix
+    table = [0] * len(keys)
+    matched = 0
+    for i in range(1, len(keys)):
+        while matched and keys[i] != keys[matched]:
+            matched = table[matched - 1]
+        if keys[i] == keys[matched]:
+            matched += 1
+        table[i] = matched
+    return table
+
+def find_overlap(previous_keys, current_keys):
+    # Finds the longest run of lines ending the previous frame that appears in the current one and
+    # returns (start, length) of that run in the current frame, (0, 0) when nothing lines up.
+    # Runs KMP on both frames reversed, so the search is linear in the number of lines.
+    pattern, text = previous_keys[::-1], current_keys[::-1]
+    if not pattern or not text:
+        return 0, 0
+
+    table = prefix_function(pattern)
+    best_start, best_length, matched = 0, 0, 0
+    for i, key in enumerate(text):
+        while matched and key != pattern[matched]:
+            matched = table[matched - 1]
+        if key == pattern[matched]:
+            matched += 1
+        # On a tie keep the earlier run, so a repeated message after it is still reported
+        if matched and matched >= best_length:
+            best_start, best_length = len(text) - 1 - i, matched
+        if matched == len(pattern):
+            matched = table[matched - 1]
+    return best_start, best_length
+
+class TranscriptAligner:
+    # Reports the (username, message) entries appended since the previous frame. Old entries are
+    # recognised by position, not by value, so a repeated "lol" further down is still new. Lines
+    # are compared by their dedupe index id, so an OCR misread of an old line still lines up.
+    def __init__(self, dedupe_index=None):
+        self.dedupe_index = dedupe_index or DedupeIndex()
+        self.previous_keys = None
+
+    def reset(self):
+        self.previous_keys = None
+
+    def new_entries(self, entries):
+        keys = [self.dedupe_index.canonical_id(f"{username}: {message}") for username, message in entries]
+        if self.previous_keys is None:
+            self.previous_keys = keys
+            return list(entries)
+
+        start, length = find_overlap(self.previous_keys, keys)
+        self.previous_keys = keys
+        return list(entries[start + length:])
\ No newline at end of file
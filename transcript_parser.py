@@ -0,0 +1,117 @@
+import re
+from functools import lru_cache
+from ignore_matcher import get_ignore_matcher
+
+def fold_case(text):
+    # Lowercase that keeps one character per input character, so positions in the folded text
+    # are positions in the original. Lowering a few characters (e.g. dotted I) changes the length,
+    # those strings are lowered one character at a time instead
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return [char.lower() for char in text]
+
+class UsernameTrie:
+    # Case-insensitive prefix tree of usernames. The tree is also compiled into a nested regex
+    # (one branch per distinct next character) so the common case is matched by re in C, in time
+    # bounded by the username length and not by the size of the roster
+    def __init__(self, usernames):
+        self.root = {}
+        self.usernames = {}  # Folded spelling -> username as written in the roster
+        for username in usernames:
+            if not username:
+                continue
+            node = self.root
+            folded = fold_case(username)
+            for char in folded:
+                node = node.setdefault(char, {})
+            node.setdefault(None, username)  # First spelling in the roster wins
+            self.usernames.setdefault(''.join(folded), username)
+        self.regex = re.compile(self.node_pattern(self.root)) if self.root else None
+
+    def node_pattern(self, node):
+        branches = [re.escape(char) + self.node_pattern(child) for char, child in sorted(node.items(), key=lambda item: str(item[0])) if char is not None]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional tail, so the longest username wins and shorter ones are tried on backtrack
+        return f'(?:{pattern})?' if None in node else pattern
+
+    def match(self, line):
+        # Returns (username, length) for the longest username the line starts with, or (None, 0)
+        folded = fold_case(line)
+        if isinstance(folded, str):
+            found = self.regex.match(folded) if self.regex is not None else None
+            if not found or not found.end():
+                return None, 0
+            return self.usernames[found.group()], found.end()
+
+        node, match, length = self.root, None, 0
+        for i, char in enumerate(folded):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                match, length = node[None], i + 1
+        return match, length
+
+class TranscriptParser:
+    # Turns OCR text into (username, message) tuples in one pass over the lines. Lines that do not
+    # start with a known username continue the previous message: with merge_continuations they are
+    # joined onto it, otherwise each becomes its own tuple. Lines before the first username are
+    # dropped unless unknown_username is set.
+    def __init__(self, my_username, other_usernames, ignored_patterns=(), merge_continuations=False, unknown_username=None):
+        self.usernames = [my_username] + list(other_usernames)
+        self.trie = UsernameTrie(self.usernames)
+        self.ignore_matcher = get_ignore_matcher(ignored_patterns)
+        self.merge_continuations = merge_continuations
+        self.unknown_username = unknown_username
+
+    def split_line(self, line):
+        username, length = self.trie.match(line)
+        if username is None:
+            return None, line
+        message = line[length:].strip()
+        if message.startswith(':'):
+            message = message[1:].strip()
+        return username, message
+
+    def parse(self, text):
+        processed_lines = []
+        current_username = None
+        current_message = []
+
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line or self.ignore_matcher.matches(line):
+                continue
+
+            username, message = self.split_line(line)
+            if username is None:
+                # Continuation of the previous message
+                username = current_username or self.unknown_username
+                if username is None:
+                    continue
+                if self.merge_continuations and current_username is not None:
+                    current_message.append(message)
+                    continue
+
+            if self.merge_continuations:
+                if current_message:
+                    processed_lines.append((current_username, ' '.join(current_message)))
+                current_message = [message]
+            else:
+                processed_lines.append((username, message))
+            current_username = username
+
+        if current_message:
+            processed_lines.append((current_username, ' '.join(current_message)))
+        return processed_lines
+
+@lru_cache(maxsize=16)
+def _build_parser(my_username, other_usernames, ignored_patterns, merge_continuations, unknown_username):
+    return TranscriptParser(my_username, other_usernames, ignored_patterns, merge_continuations, unknown_username)
+
+def get_transcript_parser(my_username, other_usernames, ignored_patterns=(), merge_continuations=False, unknown_username=None):
+    # Parsers are cached per settings, so the trie is only rebuilt when usernames or patterns change
+    return _build_parser(my_username, tuple(other_usernames), tuple(ignored_patterns), merge_continuations, unknown_username)
\ No newline at end of file
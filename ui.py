@@ -2,15 +2,28 @@ import logging
 from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QWidget, QHBoxLayout, 
                              QPushButton, QLabel, QLineEdit, QMessageBox, 
                              QTextEdit, QApplication, QSpinBox)
-from PyQt5.QtCore import Qt, pyqtSlot
-from utils import load_settings, save_settings, setup_logging
+from PyQt5.QtCore import Qt, QTimer, pyqtSlot
+from utils import setup_logging, stop_logging, REQUIRED_SETTINGS
+from settings_service import settings_service
 from ollama import OllamaAPI
 from settings import SettingsDialog
 from analyzer import TransparentWindow
+from ocr_engine import create_ocr_engine
+from screen_grab import create_screen_grabber
 from capture_handler import CaptureHandler
+from chat_region import ChatRegion, region_configs
+from seen_index import SeenMessageIndex, index_path
 from start_analyzer import StartAnalyzer
 from ai_handler import AIHandler
 from chat_position_handler import ChatPositionHandler
+from metrics import metrics
+from metrics_panel import MetricsPanel
+from conversation_log import set_backend, set_flush_policy, flush_conversation_logs, close_conversation_logs
+from log_manager import log_manager
+
+# Read when the capture pipeline is built, a change only takes effect after a restart
+RESTART_SETTINGS = ['ocr_engine', 'tesseract_cmd', 'ocr_workers', 'capture_backend', 'replay_source', 'regions',
+                    'dedupe_capacity', 'seen_index_max_entries', 'seen_index_max_age_days']
 
 class PipsChatAnalyserUI(QMainWindow):
     def __init__(self):
@@ -22,15 +35,40 @@ class PipsChatAnalyserUI(QMainWindow):
         self.my_username = ""
         self.other_usernames = []
         self.ignored_patterns = []
+        self.ocr_engine_name = "auto"
+        self.tesseract_cmd = ""
+        self.ocr_workers = 0
+        self.capture_backend = "auto"
+        self.probe_min_interval = 1
+        self.replay_source = ""
+        self.frame_buffer_size = 10
+        self.debug_mode = False
+        self.preprocessing = []
+        self.dedupe_capacity = 2000
+        self.seen_index_max_entries = 20000
+        self.seen_index_max_age_days = 30
+        self.metrics_export_file = ""
+        self.metrics_export_timer = QTimer(self)
+        self.metrics_export_timer.timeout.connect(self.export_metrics)
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.timeout.connect(flush_conversation_logs)
+        self.history_token_budget = 1500
+        self.history_max_messages = 100
+        self.region_configs = []
+        self.regions = []
+        self.start_analyzer = None
+        self.analyzer_window = None
         self.chat_position_handler = ChatPositionHandler()
         self.log_file = None
         self.initUI()
         self.setup_logging()
+        settings_service.start()
         self.load_settings()
         self.init_analyzer()
         self.init_capture_handler()
         self.init_ai_handler()
         self.init_start_analyzer()
+        settings_service.settings_changed.connect(self.on_settings_changed)
 
     def initUI(self):
         self.setWindowTitle("PIPS CHAT ANALYSER")
@@ -57,6 +95,14 @@ class PipsChatAnalyserUI(QMainWindow):
         self.settings_button = QPushButton("Settings", self)
         self.settings_button.clicked.connect(self.open_settings)
         button_layout.addWidget(self.settings_button)
+
+        self.dump_frames_button = QPushButton("Dump Frames", self)
+        self.dump_frames_button.clicked.connect(self.dump_debug_frames)
+        button_layout.addWidget(self.dump_frames_button)
+
+        self.stats_button = QPushButton("Stats", self)
+        self.stats_button.setCheckable(True)
+        button_layout.addWidget(self.stats_button)
         layout.addLayout(button_layout)
         
         # Username inputs
@@ -77,7 +123,7 @@ class PipsChatAnalyserUI(QMainWindow):
         self.capture_interval_input = QSpinBox(self)
         self.capture_interval_input.setRange(1, 3600)
         self.capture_interval_input.setValue(self.capture_interval)
-        interval_layout.addWidget(QLabel("Capture Interval (seconds):"))
+        interval_layout.addWidget(QLabel("Max Capture Interval (seconds):"))
         interval_layout.addWidget(self.capture_interval_input)
         layout.addLayout(interval_layout)
         
@@ -87,6 +133,11 @@ class PipsChatAnalyserUI(QMainWindow):
         self.chat_log.setReadOnly(True)
         layout.addWidget(self.chat_log)
 
+        self.metrics_panel = MetricsPanel(self)
+        self.metrics_panel.hide()
+        self.stats_button.toggled.connect(self.metrics_panel.setVisible)
+        layout.addWidget(self.metrics_panel)
+
         # Last captured line display
         self.last_captured_line = QLineEdit(self)
         self.last_captured_line.setReadOnly(True)
@@ -131,27 +182,95 @@ class PipsChatAnalyserUI(QMainWindow):
         self.logger = setup_logging(self.chat_log)
 
     def load_settings(self):
-        settings = load_settings()
-        self.ollama_api = OllamaAPI(settings['ollama_url'], settings['model'])
+        self.apply_settings(settings_service.get())
+
+    @pyqtSlot(dict, set)
+    def on_settings_changed(self, settings, changed):
+        restart = [key for key in RESTART_SETTINGS if key in changed]
+        if restart:
+            logging.info(f"Restart the app to apply: {', '.join(restart)}")
+        self.apply_settings(settings, changed)
+
+    def apply_settings(self, settings, changed=None):
+        # On startup everything is applied. On a reload only what depends on the changed keys is
+        # rebuilt, and an input field is only refreshed while it still shows the old value, so
+        # unsaved edits are kept
+        reload = changed is not None
+        changed = set(settings) if changed is None else changed
+        previous_inputs = (self.prompt_text, self.my_username, self.other_usernames, self.capture_interval)
+        if self.ollama_api is None or (self.ollama_api.base_url, self.ollama_api.model) != (settings['ollama_url'], settings['model']):
+            self.ollama_api = OllamaAPI(settings['ollama_url'], settings['model'])
+            if self.ai_handler:
+                self.ai_handler.set_ollama_api(self.ollama_api)
         self.capture_interval = settings['capture_interval']
         self.prompt_text = settings.get('prompt', '')
         self.my_username = settings.get('my_username', '')
         self.other_usernames = settings.get('other_usernames', [])
         self.ignored_patterns = settings.get('ignored_lines', [])
+        self.ocr_engine_name = settings.get('ocr_engine', 'auto')
+        self.tesseract_cmd = settings.get('tesseract_cmd', '')
+        self.ocr_workers = settings.get('ocr_workers', 0)
+        self.capture_backend = settings.get('capture_backend', 'auto')
+        self.probe_min_interval = settings.get('probe_min_interval', 1)
+        self.replay_source = settings.get('replay_source', '')
+        self.frame_buffer_size = settings.get('frame_buffer_size', 10)
+        self.debug_mode = settings.get('debug_mode', False)
+        self.preprocessing = settings.get('preprocessing', [])
+        self.dedupe_capacity = settings.get('dedupe_capacity', 2000)
+        self.seen_index_max_entries = settings.get('seen_index_max_entries', 20000)
+        self.seen_index_max_age_days = settings.get('seen_index_max_age_days', 30)
+        self.history_token_budget = settings.get('history_token_budget', 1500)
+        self.history_max_messages = settings.get('history_max_messages', 100)
+        self.region_configs = region_configs(settings)
+        if changed & {'metrics_enabled', 'metrics_window', 'metrics_export_file', 'metrics_export_interval'}:
+            metrics.configure(settings['metrics_enabled'], settings['metrics_window'])
+            self.metrics_export_file = settings['metrics_export_file'] if settings['metrics_enabled'] else ""
+            if self.metrics_export_file:
+                self.metrics_export_timer.start(max(1, settings['metrics_export_interval']) * 1000)
+            else:
+                self.metrics_export_timer.stop()
+        if changed & {'log_backend', 'log_database'}:
+            set_backend(settings['log_backend'], settings['log_database'])
+        if changed & {'log_rotate_mb', 'log_rotate_hours', 'log_retention_days', 'log_max_total_mb', 'log_compression'}:
+            log_manager.configure(settings['log_rotate_mb'], settings['log_retention_days'], settings['log_max_total_mb'],
+                                  settings['log_compression'], settings['log_rotate_hours'])
+        if changed & {'log_flush_policy', 'log_flush_interval'}:
+            set_flush_policy(settings['log_flush_policy'])
+            if settings['log_flush_policy'] == 'interval':
+                self.log_flush_timer.start(int(max(0.1, settings['log_flush_interval']) * 1000))
+            else:
+                self.log_flush_timer.stop()
+        if 'log_widget_max_lines' in changed:
+            self.chat_log.document().setMaximumBlockCount(settings['log_widget_max_lines'])
         chat_input_position = settings.get('chat_input_position', {})
-        if chat_input_position:
+        if chat_input_position and 'chat_input_position' in changed:
             self.chat_position_handler.set_chat_position_from_settings(chat_input_position['x'], chat_input_position['y'])
             self.update_chat_position_inputs(chat_input_position['x'], chat_input_position['y'])
         
-        self.background_prompt.setPlainText(self.prompt_text)
-        self.my_username_input.setText(self.my_username)
-        self.other_usernames_input.setText(", ".join(self.other_usernames))
-        self.capture_interval_input.setValue(self.capture_interval)
+        prompt, my_username, other_usernames, capture_interval = previous_inputs
+        if not reload or self.background_prompt.toPlainText() == prompt:
+            self.background_prompt.setPlainText(self.prompt_text)
+        if not reload or self.my_username_input.text() == my_username:
+            self.my_username_input.setText(self.my_username)
+        if not reload or self.other_usernames_input.text() == ", ".join(other_usernames):
+            self.other_usernames_input.setText(", ".join(self.other_usernames))
+        if not reload or self.capture_interval_input.value() == capture_interval:
+            self.capture_interval_input.setValue(self.capture_interval)
         
-        if self.ai_handler:
+        if self.ai_handler and 'prompt' in changed:
             self.ai_handler.set_background_prompt(self.prompt_text)
+        if self.start_analyzer:
+            self.start_analyzer.set_history_limits(self.history_token_budget, self.history_max_messages)
+            self.start_analyzer.set_capture_intervals(self.probe_min_interval, self.capture_interval)
+        for region, config in zip(self.regions, self.region_configs):
+            if changed & {'frame_buffer_size', 'debug_mode'}:
+                region.analyzer_window.set_debug_options(self.frame_buffer_size, self.debug_mode)
+            if 'preprocessing' in changed:
+                region.analyzer_window.set_preprocessing(self.preprocessing)
+            if changed & {'my_username', 'other_usernames', 'ignored_lines', 'regions'}:
+                region.capture_handler.update_settings(config['my_username'], config['other_usernames'], config['ignored_lines'])
         
-        logging.info(f"Settings loaded successfully")
+        logging.info(f"Settings {'reloaded' if reload else 'loaded'} successfully")
 
     def save_settings(self):
         settings = {
@@ -164,28 +283,62 @@ class PipsChatAnalyserUI(QMainWindow):
             'ignored_lines': self.ignored_patterns,
             'chat_input_position': {'x': int(self.chat_x_input.text()), 'y': int(self.chat_y_input.text())} if self.chat_position_handler.has_position() else {}
         }
-        save_settings(settings)
-        self.load_settings()  # Reload settings after saving
+        settings_service.save(settings)  # Applied through settings_changed
         QMessageBox.information(self, "Success", "Settings saved successfully.")
 
     def open_settings(self):
         settings_dialog = SettingsDialog(self)
-        if settings_dialog.exec_():
-            self.load_settings()
+        settings_dialog.exec_()
+
+    def dump_debug_frames(self):
+        folders = [folder for folder in (region.analyzer_window.dump_debug_frames() for region in self.regions) if folder]
+        if folders:
+            QMessageBox.information(self, "Frames Saved", f"Recent capture frames saved to {', '.join(folders)}")
+        else:
+            QMessageBox.warning(self, "No Frames", "No capture frames available to save.")
+
+    def export_metrics(self):
+        if self.metrics_export_file:
+            metrics.export(self.metrics_export_file)
 
     def init_analyzer(self):
-        self.analyzer_window = TransparentWindow()
-        self.analyzer_window.show()
+        # One OCR engine and screen grabber serve every chat region
+        self.ocr_engine = create_ocr_engine(self.ocr_engine_name, self.tesseract_cmd, self.ocr_workers)
+        self.screen_grabber = create_screen_grabber(self.capture_backend, self.replay_source)
+        self.analyzer_windows = []
+        for config in self.region_configs:
+            name = config['name'] if len(self.region_configs) > 1 else ""
+            window = TransparentWindow(self.ocr_engine, self.frame_buffer_size, self.debug_mode,
+                                       self.preprocessing, self.screen_grabber, name, config.get('geometry'))
+            window.show()
+            self.analyzer_windows.append(window)
+        self.analyzer_window = self.analyzer_windows[0]
 
     def init_capture_handler(self):
-        self.capture_handler = CaptureHandler(self.analyzer_window, self.my_username, self.other_usernames, self.ignored_patterns)
+        self.capture_handler = CaptureHandler(self.analyzer_window, self.my_username, self.other_usernames, self.ignored_patterns,
+                                              self.dedupe_capacity, self.create_seen_index(self.region_configs[0]))
+        self.regions = [ChatRegion(self.region_configs[0]['name'], self.analyzer_window, self.capture_handler, self.chat_position_handler)]
+        for config, window in zip(self.region_configs[1:], self.analyzer_windows[1:]):
+            chat_position_handler = ChatPositionHandler()
+            position = config.get('chat_input_position')
+            if position:
+                chat_position_handler.set_chat_position_from_settings(position['x'], position['y'])
+            capture_handler = CaptureHandler(window, config['my_username'], config['other_usernames'], config['ignored_lines'],
+                                             self.dedupe_capacity, self.create_seen_index(config))
+            self.regions.append(ChatRegion(config['name'], window, capture_handler, chat_position_handler))
+        if len(self.regions) > 1:
+            logging.info(f"Watching {len(self.regions)} chat regions: {', '.join(region.name for region in self.regions)}")
+
+    def create_seen_index(self, config):
+        return SeenMessageIndex(index_path('./logs', config['name']), self.seen_index_max_entries, self.seen_index_max_age_days)
 
     def init_ai_handler(self):
         self.ai_handler = AIHandler(self.ollama_api, self.prompt_text, self.chat_position_handler)
         self.ai_handler.response_ready.connect(self.handle_ollama_response)
 
     def init_start_analyzer(self):
-        self.start_analyzer = StartAnalyzer(self.analyzer_window, self.capture_handler, self.ai_handler, self.chat_position_handler, self.capture_interval)
+        self.start_analyzer = StartAnalyzer(self.regions, self.ai_handler, self.capture_interval, self.probe_min_interval,
+                                            self.ocr_engine.workers, self.history_token_budget, self.history_max_messages)
         self.start_analyzer.analysis_complete.connect(self.on_analysis_complete)
         self.start_analyzer.ollama_response_ready.connect(self.handle_ollama_response)
         self.start_analyzer.capture_complete.connect(self.on_capture_complete)
@@ -222,13 +375,24 @@ class PipsChatAnalyserUI(QMainWindow):
         self.capture_button.setEnabled(True)
 
     def check_settings(self):
-        settings = load_settings()
-        empty_settings = [key for key, value in settings.items() if not value]
+        settings = settings_service.get()
+        empty_settings = [key for key in REQUIRED_SETTINGS if not settings[key]]
         if empty_settings:
             QMessageBox.warning(self, "Empty Settings", f"The following settings are empty: {', '.join(empty_settings)}")
             return False
         return True
 
+    def closeEvent(self, event):
+        self.start_analyzer.shutdown()
+        self.export_metrics()
+        for region in self.regions:
+            region.capture_handler.close()
+        close_conversation_logs()
+        self.ocr_engine.close()
+        self.screen_grabber.close()
+        stop_logging()
+        super().closeEvent(event)
+
     @pyqtSlot(bool)
     def on_capture_complete(self, success):
         if success:
@@ -1,10 +1,21 @@
 import json
-import os
 import csv
 import logging
-import re
-from PyQt5.QtCore import QSettings, QObject, pyqtSignal
+import logging.handlers
+import queue
+import threading
+from collections import deque
+from PyQt5.QtCore import QSettings, QObject, QTimer
 from datetime import datetime
+from ignore_matcher import get_ignore_matcher
+from transcript_parser import get_transcript_parser
+import conversation_log
+from conversation_log import open_conversation_log
+from log_manager import log_manager
+
+# Settings that must be filled in before a capture can start
+REQUIRED_SETTINGS = ['ollama_url', 'model', 'capture_interval', 'prompt', 'my_username',
+                     'other_usernames', 'ignored_lines', 'chat_input_position']
 
 def load_settings():
     settings = QSettings("PipsChat", "ChatAnalyzer")
@@ -22,7 +33,36 @@ def load_settings():
         'my_username': file_settings.get('my_username') or settings.value("my_username", ""),
         'other_usernames': file_settings.get('other_usernames') or settings.value("other_usernames", []),
         'ignored_lines': file_settings.get('ignored_lines') or settings.value("ignored_lines", []),
-        'chat_input_position': file_settings.get('chat_input_position') or settings.value("chat_input_position", {})
+        'chat_input_position': file_settings.get('chat_input_position') or settings.value("chat_input_position", {}),
+        'ocr_engine': file_settings.get('ocr_engine') or settings.value("ocr_engine", "auto"),
+        'tesseract_cmd': file_settings.get('tesseract_cmd') or settings.value("tesseract_cmd", ""),
+        'frame_buffer_size': int(file_settings.get('frame_buffer_size') or settings.value("frame_buffer_size", 10)),
+        'debug_mode': file_settings['debug_mode'] if 'debug_mode' in file_settings else settings.value("debug_mode", False, type=bool),
+        'preprocessing': file_settings.get('preprocessing') or settings.value("preprocessing", []),
+        'ocr_workers': int(file_settings['ocr_workers'] if 'ocr_workers' in file_settings else settings.value("ocr_workers", 0)),
+        'capture_backend': file_settings.get('capture_backend') or settings.value("capture_backend", "auto"),
+        'replay_source': file_settings.get('replay_source') or settings.value("replay_source", ""),
+        'probe_min_interval': float(file_settings.get('probe_min_interval') or settings.value("probe_min_interval", 1)),
+        'regions': file_settings.get('regions') or settings.value("regions", []),
+        'dedupe_capacity': int(file_settings.get('dedupe_capacity') or settings.value("dedupe_capacity", 2000)),
+        'seen_index_max_entries': int(file_settings.get('seen_index_max_entries') or settings.value("seen_index_max_entries", 20000)),
+        'seen_index_max_age_days': float(file_settings.get('seen_index_max_age_days') or settings.value("seen_index_max_age_days", 30)),
+        'metrics_enabled': file_settings['metrics_enabled'] if 'metrics_enabled' in file_settings else settings.value("metrics_enabled", True, type=bool),
+        'metrics_window': int(file_settings.get('metrics_window') or settings.value("metrics_window", 500)),
+        'metrics_export_file': file_settings.get('metrics_export_file') or settings.value("metrics_export_file", "./logs/metrics.json"),
+        'metrics_export_interval': int(file_settings.get('metrics_export_interval') or settings.value("metrics_export_interval", 60)),
+        'log_flush_policy': file_settings.get('log_flush_policy') or settings.value("log_flush_policy", "cycle"),
+        'log_flush_interval': float(file_settings.get('log_flush_interval') or settings.value("log_flush_interval", 5)),
+        'log_backend': file_settings.get('log_backend') or settings.value("log_backend", "csv"),
+        'log_database': file_settings.get('log_database') or settings.value("log_database", "./logs/conversations.db"),
+        'history_token_budget': int(file_settings.get('history_token_budget') or settings.value("history_token_budget", 1500)),
+        'history_max_messages': int(file_settings.get('history_max_messages') or settings.value("history_max_messages", 100)),
+        'log_rotate_mb': float(file_settings['log_rotate_mb'] if 'log_rotate_mb' in file_settings else settings.value("log_rotate_mb", 50)),
+        'log_retention_days': float(file_settings.get('log_retention_days') or settings.value("log_retention_days", 0)),
+        'log_max_total_mb': float(file_settings.get('log_max_total_mb') or settings.value("log_max_total_mb", 0)),
+        'log_compression': file_settings.get('log_compression') or settings.value("log_compression", "gzip"),
+        'log_rotate_hours': float(file_settings.get('log_rotate_hours') or settings.value("log_rotate_hours", 0)),
+        'log_widget_max_lines': int(file_settings.get('log_widget_max_lines') or settings.value("log_widget_max_lines", 2000))
     }
 
 def save_settings(settings):
@@ -30,140 +70,162 @@ def save_settings(settings):
     for key, value in settings.items():
         q_settings.setValue(key, value)
     
+    # Merge into the existing file so keys not edited by the caller are kept
+    try:
+        with open('settings.json', 'r') as f:
+            file_settings = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        file_settings = {}
+    file_settings.update(settings)
+
     with open('settings.json', 'w') as f:
-        json.dump(settings, f, indent=4)
+        json.dump(file_settings, f, indent=4)
 
-def create_new_log_file():
-    log_folder = './logs'
-    if not os.path.exists(log_folder):
-        os.makedirs(log_folder)
+def create_new_log_file(chat=None):
+    if conversation_log.backend == 'sqlite':
+        return conversation_log.create_conversation(chat)
 
-    i = 1
-    while os.path.exists(f"{log_folder}/chatlog{i:04d}.csv"):
-        i += 1
-    
-    log_file = f"{log_folder}/chatlog{i:04d}.csv"
-    
+    log_file = log_manager.allocate(chat)
     with open(log_file, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
         writer.writerow(["ID", "Conversation", "Username", "Message"])
     
     return log_file
 
+def resume_log_file(chat):
+    # A restart keeps writing to the chat's latest log, so replies still see what was said before it
+    if conversation_log.backend == 'sqlite':
+        log_file = conversation_log.latest_conversation(chat)
+    else:
+        log_file = log_manager.latest(chat)
+        if log_file and log_manager.needs_rotation(log_file):
+            log_file = None
+    return log_file or create_new_log_file(chat)
+
 import csv
 import logging
 
 def append_to_csv(log_file, conversation_type, username, message):
+    # The log stays open between calls, rows reach the file when the capture cycle ends
     try:
-        with open(log_file, mode='r', newline='', encoding='utf-8') as readfile:
-            lines = list(csv.reader(readfile))
-            last_id = int(lines[-1][0]) if len(lines) > 1 else 0
-        
-        new_id = f"{last_id + 1:04d}"
-        
-        with open(log_file, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([new_id, conversation_type, username, message])
-        
+        open_conversation_log(log_file).append(conversation_type, username, message)
         logging.info(f"Successfully appended new entry to {log_file}")
     except IOError as e:
         logging.error(f"IOError occurred while appending to {log_file}: {str(e)}")
     except Exception as e:
         logging.error(f"Unexpected error occurred while appending to {log_file}: {str(e)}")
 
+def append_batch_to_csv(log_file, conversation_type, entries):
+    # All lines of one capture cycle in a single write (one transaction with SQLite), flushed as a unit
+    try:
+        log = open_conversation_log(log_file)
+        log.append_batch([(conversation_type, username, message) for username, message in entries])
+        log.end_cycle()
+        logging.info(f"Successfully appended {len(entries)} entries to {log_file}")
+    except IOError as e:
+        logging.error(f"IOError occurred while appending to {log_file}: {str(e)}")
+    except Exception as e:
+        logging.error(f"Unexpected error occurred while appending to {log_file}: {str(e)}")
+
 def get_last_messages(log_file, n=10):
     try:
-        with open(log_file, mode='r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip header
-            messages = list(reader)
-            return [(row[2], row[3]) for row in messages[-n:]]
+        return open_conversation_log(log_file).last_messages(n)
     except Exception as e:
-        logging.error(f"Error reading last messages from CSV: {str(e)}")
+        logging.error(f"Error reading last messages from {log_file}: {str(e)}")
         return []
 
+def estimate_tokens(text):
+    # About four characters per token for English chat, close enough to budget a prompt without a tokenizer
+    return len(text) // 4 + 1
+
+def get_conversation_context(log_file, token_budget=1500, max_messages=100):
+    # The newest messages that fit in token_budget, oldest first, so the prompt stops growing with the log
+    context, used = [], 0
+    for username, message in reversed(get_last_messages(log_file, max_messages)):
+        tokens = estimate_tokens(f"{username}: {message}\n")
+        if context and used + tokens > token_budget:
+            break
+        context.append((username, message))
+        used += tokens
+    return context[::-1]
+
 def is_ignored_line(line, ignored_patterns):
-    # Check if the line matches any of the ignored patterns
-    for pattern in ignored_patterns:
-        if re.search(pattern, line):
-            return True
-    
-    # Check for date formats
-    date_patterns = [
-        r"\w+,\s+\w+\s+\d{1,2}(st|nd|rd|th)\s+v",  # e.g., "Friday, September 13th v"
-        r"Today\s+v",
-        r"\w+\s+\d{1,2}(st|nd|rd|th),\s+\d{4}"  # e.g., "September 16th, 2024"
-    ]
-    
-    for pattern in date_patterns:
-        if re.search(pattern, line):
-            return True
-    
-    return False
+    # ignored_patterns may be a list of regexes or a prebuilt IgnoreMatcher
+    return get_ignore_matcher(ignored_patterns).matches(line)
 
 class QTextEditLogger(QObject, logging.Handler):
-    log_message = pyqtSignal(str)
-
-    def __init__(self, widget):
+    # Lines are formatted on the logging thread and held until a timer on the GUI thread appends
+    # them in one go, so a burst of log lines costs one widget update per refresh. Past max_pending
+    # lines between refreshes the oldest are dropped from the widget (the log file still has them)
+    def __init__(self, widget, refresh_interval=250, max_pending=500):
         super().__init__()
         self.widget = widget
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.dropped = 0
+        self.pending_lock = threading.Lock()
         self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush_to_widget)
+        self.timer.start(refresh_interval)
 
     def emit(self, record):
         msg = self.format(record)
-        self.log_message.emit(msg)
-
-def setup_logging(log_widget):
+        with self.pending_lock:
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append(msg)
+
+    def flush_to_widget(self):
+        with self.pending_lock:
+            if not self.pending:
+                return
+            lines, dropped = list(self.pending), self.dropped
+            self.pending.clear()
+            self.dropped = 0
+        if dropped:
+            lines.insert(0, f"... {dropped} log lines not shown here, see application_log.txt")
+        self.widget.append('\n'.join(lines))
+
+log_listener = None
+
+def setup_logging(log_widget, max_lines=2000):
+    # Every handler, including those Main added, runs on one listener thread. Logging from the
+    # capture and worker threads only puts the record on a queue
+    global log_listener
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
     
     # File handler
     file_handler = logging.FileHandler('application_log.txt')
     file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(file_handler)
     
-    # Widget handler
+    # Widget handler, the widget keeps at most max_lines lines
+    log_widget.document().setMaximumBlockCount(max_lines)
     widget_handler = QTextEditLogger(log_widget)
-    widget_handler.log_message.connect(log_widget.append)
-    logger.addHandler(widget_handler)
+
+    handlers = logger.handlers[:] + [file_handler, widget_handler]
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
 
     return logger
 
+def stop_logging():
+    # Writes out everything still queued, called once on exit
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
 def process_captured_text(text, my_username, other_usernames, ignored_patterns):
     logging.debug(f"Processing captured text: {text[:100]}...")  # Log first 100 characters
-    lines = text.split('\n')
-    processed_lines = []
-    current_username = None
-    current_message = []
-
-    for line in lines:
-        line = line.strip()
-        if not line or is_ignored_line(line, ignored_patterns):
-            continue
-
-        username_match = False
-        for username in [my_username] + other_usernames:
-            if line.lower().startswith(username.lower()):
-                if current_username and current_message:
-                    processed_lines.append((current_username, ' '.join(current_message)))
-                current_username = username
-                message = line[len(username):].strip()
-                if message.startswith(':'):
-                    message = message[1:].strip()
-                current_message = [message]
-                username_match = True
-                break
-        
-        if not username_match:
-            if current_username:
-                current_message.append(line)
-            else:
-                # If no username has been found yet, treat this as a new message with an unknown user
-                current_username = "Unknown"
-                current_message = [line]
-
-    if current_username and current_message:
-        processed_lines.append((current_username, ' '.join(current_message)))
-
+    parser = get_transcript_parser(my_username, other_usernames, ignored_patterns,
+                                   merge_continuations=True, unknown_username="Unknown")
+    processed_lines = parser.parse(text)
     logging.debug(f"Processed {len(processed_lines)} lines")
     return processed_lines
\ No newline at end of file